@@ -1,7 +1,21 @@
 import os
-import requests
+from tiler import fetch_tiled
+import response_cache
+from listing import Listing, RAW_FIELDS
+from listing_table import ListingTable
+from hash_cache import ListingCache, source_version
+from keywords import KeywordMatcher
+from listing_query import ListingQuery
+import listing_store
+import history
+import finance
+import sweep
+import montecarlo
+import pareto
+from ranking import TopK
 import math
 from datetime import datetime
+import time
 import sys, io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
@@ -12,28 +26,9 @@ BASEMENT_RENT = 1800
 UPSTAIRS_RENT = 3000
 CURRENT_YEAR = datetime.now().year
 TOP_N = 5
+MAX_CONCURRENT_REQUESTS = 3        # region payloads in flight at once
 url = "https://api2.realtor.ca/Listing.svc/PropertySearch_Post"
 
-headers = {
-    "accept": "*/*",
-    "accept-language": "en-US,en;q=0.9",
-    "content-type": "application/x-www-form-urlencoded; charset=UTF-8",
-    "origin": "https://www.realtor.ca",
-    "priority": "u=1, i",
-    "referer": "https://www.realtor.ca/",
-    "sec-ch-ua": '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
-    "sec-ch-ua-mobile": "?0",
-    "sec-ch-ua-platform": '"Windows"',
-    "sec-fetch-dest": "empty",
-    "sec-fetch-mode": "cors",
-    "sec-fetch-site": "same-site",
-    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
-}
-
-cookies = {
-    "reese84": "cookie"   # replace with your actual cookie value
-}
-
 dataBrampton = {
     "ZoomLevel": "10",
     "LatitudeMax": "43.84110",
@@ -114,223 +109,75 @@ dataCaledon = {
 
 
 # ===== STEP 1. Fetch Latest Dataset from Apify =====
-def fetch_latest_properties():
-    try:
-        all_listings = []
-        responseBrampton = requests.post(url, headers=headers, cookies=cookies, data=dataBrampton)
-        json_data_brampton = responseBrampton.json()
-
-        responseMississauga = requests.post(url, headers=headers, cookies=cookies, data=dataMississauga)
-        json_data_mississauga = responseMississauga.json()
-
-        responseCaledon = requests.post(url, headers=headers, cookies=cookies, data=dataCaledon)
-        json_data_caledon = responseCaledon.json()
-
-        print("✅ JSON response received:")
-
-    except ValueError:
-        print("⚠️ Response is not valid JSON. Here's the raw text:")
-        print(response.text)
-    
-    all_listings = json_data_brampton['Results']
-    all_listings.extend(json_data_mississauga['Results'])
-    all_listings.extend(json_data_caledon['Results'])
-    
+def fetch_latest_properties(incremental=False):
+    regions = {
+        "Brampton": dataBrampton,
+        "Mississauga": dataMississauga,
+        "Caledon": dataCaledon,
+    }
+    response_cache.apply_cli_flags(url, regions)
+    all_listings, _ = fetch_tiled(url, regions, max_workers=MAX_CONCURRENT_REQUESTS,
+                                  rediscover="--retile" in sys.argv,
+                                  incremental=incremental,
+                                  transform=Listing.from_raw, projection=RAW_FIELDS)
     return all_listings
-    
-    # return {
-    #     "listngs_london": json_data_london,
-    #     "listings_kwc": json_data_kwc,
-    #     "listings_brantford": json_data_brantford
-    #     }
 
 # ===== STEP 2. Mortgage Helper Functions =====
-def cmhc_premium_rate(downpayment_percent):
-    if downpayment_percent < 0.10:
-        return 0.04
-    elif downpayment_percent < 0.15:
-        return 0.031
-    elif downpayment_percent < 0.20:
-        return 0.028
-    return 0.0
+DOWN_PAYMENTS = (0.10, 0.20)     # Scenario 1 (first time buyers), Scenario 2 (investment buyers)
 
-def calculate_monthly_payment(price, downpayment_percent=0.05, rate=MORTGAGE_RATE, years=AMORTIZATION_YEARS):
-    """
-    Calculate mortgage with minimum downpayment rules + CMHC insurance if <20%.
-    """
-    downpayment = price * downpayment_percent
-    mortgage_amount = price - downpayment
-
-    # CMHC insurance estimate (if <20% downpayment)
-    cmhc_fee = cmhc_premium_rate(downpayment_percent) * mortgage_amount
-    mortgage_amount += cmhc_fee
-
-    monthly_rate = rate / 12
-    n_payments = years * 12
-    monthly_payment = mortgage_amount * (monthly_rate * (1 + monthly_rate) ** n_payments) / ((1 + monthly_rate) ** n_payments - 1)
-    return monthly_payment, downpayment
+def calculate_cashflows(props):
+    """Payments, tax and cashflows of post records at every DOWN_PAYMENTS share, in one NumPy pass."""
+    return finance.residential_cashflows(
+        [float(prop.get("price", 0)) for prop in props],
+        [float(prop.get("tax_amount", 0)) for prop in props],
+        DOWN_PAYMENTS, BASEMENT_RENT + UPSTAIRS_RENT, MORTGAGE_RATE, AMORTIZATION_YEARS)
 
 # ===== STEP 3. Filter Listings =====
 LEGAL_BASEMENT_KEYWORDS = [
-    "legal basement", "separate entrance", "in-law suite",
-    "second dwelling", "income potential", "finished basement"
+    "legal basement", "second dwelling", "registered basement",
+    "2nd unit", "legal second unit", "income suite", "dual dwelling"
 ]
-
-def has_legal_basement(description: str) -> bool:
-    description = description.lower()
-    return any(kw in description for kw in LEGAL_BASEMENT_KEYWORDS)
+LEGAL_BASEMENT = KeywordMatcher(LEGAL_BASEMENT_KEYWORDS)
 
 CURRENT_YEAR = datetime.now().year
 
-def has_legal_basement(description):
-    """Check if the property description indicates a legal basement apartment."""
-    keywords = [
-        "legal basement", "second dwelling", "registered basement",
-        "2nd unit", "legal second unit", "income suite", "dual dwelling"
-    ]
-    return any(k in description for k in keywords)
-
-def parse_bedrooms(bedroom_str):
-    """Convert a '3 + 2' style string into total integer bedrooms."""
-    if not bedroom_str:
-        return 0
-    parts = bedroom_str.replace(" ", "").split("+")
-    try:
-        return sum(int(p) for p in parts if p.isdigit())
-    except ValueError:
-        return 0
-
-def filter_properties(data):
-    """Filter properties meeting specific conditions from the Realtor JSON file."""
-    filtered = []
-
-    for prop in data:
-        try:
-            building = prop.get("Building", {})
-            property_info = prop.get("Property", {})
-            land = prop.get("Land", {})
-            description = (prop.get("PublicRemarks", "")).lower()
-
-            # Bedrooms and bathrooms
-            bedrooms = parse_bedrooms(building.get("Bedrooms", "0"))
-            bathrooms = int(building.get("BathroomTotal", 0))
-
-            # Parking
-            parking = int(property_info.get("ParkingSpaceTotal", 0))
-
-            # Skip missing or incomplete data
-            if bedrooms < 3 or bathrooms < 2 or parking < 2:
-                continue
-
-            # Filter for legal basement
-            if not has_legal_basement(description):
-                continue
-
-            # Extract address info
-            address_info = property_info.get("Address", {})
-            address_text = address_info.get("AddressText", "")
-            area = ""
-            if "|" in address_text:
-                area = address_text.split("|")[1].split(",")[0].strip()
-
-            # Collect extra info
-            price = float(property_info.get("PriceUnformattedValue", 0))
-            amenities = property_info.get("AmmenitiesNearBy", "")
-            lot_size = land.get("SizeTotal", "")
-            basement_features = building.get("BasementFeatures", "")
-
-            filtered.append({
-                "mlsNumber": prop.get("MlsNumber", ""),
-                "area": area,
-                "bedrooms": bedrooms,
-                "bathrooms": bathrooms,
-                "parking": parking,
-                "description": description,
-                "price": price,
-                "amenities": amenities,
-                "lot_size": lot_size,
-                "image": (
-                    property_info.get("Photo", [{}])[0].get("HighResPath", "")
-                    if property_info.get("Photo") else ""
-                ),
-                "url": "https://www.realtor.ca" + prop.get("RelativeURLEn", ""),
-            })
-
-        except Exception as e:
-            continue
-
-    return filtered
-
-def _filter_properties(properties):
-    filtered = []
-    for prop in properties['Results']:
-        print(f"Property details {prop['Property']}")
-        try:
-            building = prop.get("Building", {})
-            property_info = prop.get("Property", {})
-
-            # Bedrooms: sum of above and below ground
-            bedrooms_above = int(building.get("BedroomsAboveGround", 0))
-            bedrooms_below = int(building.get("BedroomsBelowGround", 0))
-            bedrooms = bedrooms_above + bedrooms_below
-
-            # Bathrooms
-            bathrooms = int(building.get("BathroomTotal", 0))
-
-            # Parking
-            parking = int(property_info.get("ParkingSpaceTotal", 0))
-
-            # Year built: not available, so skip this filter or use DisplayAsYears as age
-            age = building.get("DisplayAsYears")
-            year_built = CURRENT_YEAR - int(age) if age and age.isdigit() else CURRENT_YEAR
-
-            # Description: use PublicRemarks and BasementFeatures
-            description = (prop.get("PublicRemarks", "") + " " + building.get("BasementFeatures", "")).lower()
-
-            if (bedrooms >= 3 and bathrooms >= 2 and parking >= 2 and 
-                (CURRENT_YEAR - year_built) <= 35 and has_legal_basement(description)):
-                address_text = property_info.get("Address", {}).get("AddressText", "")
-                area = ""
-                if "|" in address_text:
-                    area = address_text.split("|")[1].split(",")[0].strip()
-                amenities = property_info.get("AmmenitiesNearBy", "")
-                lot_size = prop.get("Land", {}).get("SizeTotal", "")
-                basement_features = building.get("BasementFeatures", "")
-                if amenities and lot_size and basement_features:
-                    filtered.append({
-                        # "address": address_text,  # address removed from post
-                        "area": area,
-                        "bedrooms": bedrooms,
-                        "bathrooms": bathrooms,
-                        "parking": parking,
-                        "yearBuilt": year_built,
-                        "description": description,
-                        "price": property_info.get("PriceUnformattedValue", 0),
-                        "amenities": amenities,
-                        "lot_size": lot_size,
-                        "basement_features": basement_features,
-                        "tax_amount": float(property_info.get("TaxAmount", "0").replace("$", "").replace(",", "").strip() or 0),
-                        # "url": "https://www.realtor.ca" + prop.get("RelativeURLEn", "")
-                    })
-        except Exception:
-            continue
-    return filtered
+# Numeric thresholds are checked first over the whole batch, then the remarks
+LISTING_QUERY = ListingQuery("""
+    bedrooms >= 3               # "4 + 1" counts as 5
+    bathrooms >= 2
+    parking >= 2
+    remarks matches LEGAL_BASEMENT
+""", matchers={"LEGAL_BASEMENT": LEGAL_BASEMENT})
+
+def property_record(listing):
+    """Post record of a listing that passed LISTING_QUERY."""
+    description = listing.remarks.lower()
+    return {
+        "mlsNumber": listing.mls_number,
+        "area": listing.area,
+        "bedrooms": listing.bedrooms,
+        "bathrooms": listing.bathrooms,
+        "parking": listing.parking,
+        "description": description,
+        "price": listing.price,
+        "amenities": listing.amenities,
+        "lot_size": listing.lot_size,
+        "image": listing.photo_url,
+        "url": "https://www.realtor.ca" + listing.relative_url,
+    }
 
 # ===== STEP 4. Create WhatsApp Post =====
-def format_whatsapp_post(prop):
+def format_whatsapp_post(prop, cashflows=None, row=0):
+    """cashflows: calculate_cashflows() of a batch holding prop at index row (computed here if not given)."""
     price = float(prop.get("price", 0))
-
-    monthly_payment_10, downpayment_10 = calculate_monthly_payment(price, downpayment_percent=0.10)
-    monthly_payment_20, downpayment_20 = calculate_monthly_payment(price, downpayment_percent=0.20)
-
-    # Calculate monthly property tax from TaxAmount field
-    monthly_tax = float(prop.get('tax_amount', 0)) / 12
-    monthly_utilities = 300.0
-    monthly_ins_misc = 200.0
-
-    total_rent = BASEMENT_RENT + UPSTAIRS_RENT
-    cashflow_10 = total_rent - (monthly_payment_10 + monthly_tax + monthly_utilities + monthly_ins_misc)
-    cashflow_20 = total_rent - (monthly_payment_20 + monthly_tax + monthly_utilities + monthly_ins_misc)
+    if cashflows is None:
+        cashflows = calculate_cashflows([prop])
+
+    monthly_payment_10, monthly_payment_20 = cashflows["payment"][row]
+    # Monthly property tax from TaxAmount field
+    monthly_tax = cashflows["monthly_tax"][row]
+    monthly_ins_misc = finance.MONTHLY_INS_MISC
+    cashflow_10, cashflow_20 = cashflows["cashflow"][row]
     
     area_text = prop.get('area', '')
     area_line = f"🔥 *Investment Opportunity in {area_text}*" if area_text else "🔥 *Investment Opportunity*"
@@ -405,32 +252,86 @@ def format_whatsapp_post(prop):
 {exclusive_section}
     """
 
+# ===== STEP 5. Evaluate Listings =====
+def evaluate_listings(listings):
+    """
+    Filter, score (cashflow at 20% down) and render a batch of listings.
+    Returns one entry per listing, None where the listing does not qualify.
+    """
+    table = ListingTable(listings)
+    matched = [(i, property_record(table.listings[i])) for i in LISTING_QUERY.indices(table)]
+
+    entries = [None] * len(table)
+    if not matched:
+        return entries
+    # Every scenario of every matched listing at once; the score is rent - payment at 20% down
+    cashflows = calculate_cashflows([prop for _, prop in matched])
+    scores = cashflows["cashflow_before_costs"][:, DOWN_PAYMENTS.index(0.20)]
+    for row, (i, prop) in enumerate(matched):
+        entries[i] = {"record": prop, "score": float(scores[row]),
+                      "post": format_whatsapp_post(prop, cashflows, row)}
+    return entries
+
 # ===== MAIN PIPELINE =====
 if __name__ == "__main__":
-    all_listings = fetch_latest_properties()
+    # --from-store re-ranks the listings stored by earlier runs instead of refetching
+    if "--from-store" in sys.argv:
+        all_listings = listing_store.load_listings(source="brampton-750k-1m")
+    else:
+        # --incremental still fetches everything once the last full fetch is FULL_RUN_DAYS old
+        incremental = "--incremental" in sys.argv and not listing_store.needs_full_run("brampton-750k-1m")
+        started = time.time()
+        all_listings = fetch_latest_properties(incremental)
+        listing_store.save_listings(all_listings, source="brampton-750k-1m")
+        # A full fetch saw every listing still for sale: stored rows it missed are no longer live
+        if not incremental:
+            listing_store.record_run("brampton-750k-1m", started)
+        history.append_snapshot(all_listings, market="brampton-750k-1m")
+        # An incremental fetch only returned what changed since the last run: rank it with the stored rest
+        if incremental:
+            all_listings = listing_store.load_listings(source="brampton-750k-1m")
     print(f'Listings Fetched are {all_listings}')
 
-    filtered = filter_properties(all_listings)
-
-    print(f"Listings matching criteria: {len(filtered)}")
-
-    # Take top N (sorted by cashflow estimate at 20% down)
-    scored = []
-    for prop in filtered:
-        price = float(prop.get("price", 0))
-        monthly_payment, _ = calculate_monthly_payment(price, downpayment_percent=0.20)
-        total_rent = BASEMENT_RENT + UPSTAIRS_RENT
-        cashflow = total_rent - monthly_payment
-        scored.append((cashflow, prop))
-
-    scored.sort(reverse=True, key=lambda x: x[0])
-    top_props = [prop for _, prop in scored[:TOP_N]]
+    # Only listings whose HashCode changed since the last run are filtered, scored and rendered
+    cache = ListingCache("brampton-750k-1m", fingerprint=[
+        MORTGAGE_RATE, AMORTIZATION_YEARS, BASEMENT_RENT, UPSTAIRS_RENT, CURRENT_YEAR,
+        LISTING_QUERY.text, LEGAL_BASEMENT_KEYWORDS,
+        # Filter and post template code: editing either re-renders every listing
+        source_version(__file__, Listing, ListingTable, ListingQuery, KeywordMatcher, finance)])
+    entries = cache.derive_batch(all_listings, evaluate_listings)
+    evaluated = [entry for entry in entries if entry]
+    cache.save()
+    cache.report()
+
+    print(f"Listings matching criteria: {len(evaluated)}")
+    if "--filter-stats" in sys.argv:
+        LISTING_QUERY.report()
+
+    matched = [listing for listing, entry in zip(all_listings, entries) if entry]
+    inputs = sweep.residential_inputs(matched, BASEMENT_RENT + UPSTAIRS_RENT)
+    # --sweep: every rate x down payment x amortization x rent level over the matching listings
+    if "--sweep" in sys.argv:
+        sweep.report(matched, *inputs, down_payment=0.20, years=AMORTIZATION_YEARS, top_n=TOP_N)
+    # --montecarlo: cashflow percentiles under random rate paths, vacancy, rents and costs
+    if "--montecarlo" in sys.argv:
+        montecarlo.report(matched, *inputs, down_payment=0.20, rate=MORTGAGE_RATE, years=AMORTIZATION_YEARS)
+
+    # Rank by cashflow estimate at 20% down, or with --pareto frontier listings
+    # first (cap rate, cash-on-cash, price/sqft, cashflow), best weighted score first
+    keys = [(entry["score"],) for entry in evaluated]
+    if "--pareto" in sys.argv:
+        ranked = pareto.report(matched, *inputs, down_payment=0.20, rate=MORTGAGE_RATE, years=AMORTIZATION_YEARS)
+        keys = list(zip(ranked["frontier"].tolist(), ranked["score"].tolist()))
+
+    # Take top N (bounded heap, no full sort)
+    top = TopK(TOP_N, key=lambda i: keys[i]).extend(range(len(evaluated)))
+    top_props = [evaluated[i] for i in top.best()]
 
     # Output WhatsApp-style posts and write to file
     output_lines = []
-    for idx, prop in enumerate(top_props, 1):
+    for idx, entry in enumerate(top_props, 1):
         output_lines.append(f"\n=== Property #{idx} ===")
-        output_lines.append(format_whatsapp_post(prop))
+        output_lines.append(entry["post"])
 
     output_text = '\n'.join(output_lines)
     print(output_text)
@@ -1,5 +1,20 @@
 import os
-import requests
+from tiler import fetch_tiled
+import response_cache
+from listing import Listing, RAW_FIELDS
+from hash_cache import ListingCache, source_version
+from keywords import KeywordMatcher
+from listing_query import ListingQuery
+from listing_table import ListingTable
+import remarks_cleanup
+import listing_store
+import history
+import finance
+import sweep
+import montecarlo
+import pareto
+from ranking import TopK
+import time
 import sys, io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
@@ -8,9 +23,16 @@ sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 MORTGAGE_RATE = 0.04   # 4% mortgage rate
 DOWN_PAYMENT = 0.20    # 20% down
 AMORT_YEARS = 25       # 25-year amortization
+MAX_CONCURRENT_REQUESTS = 3   # region payloads in flight at once
 
 MULTIPLEX_TYPES = ["duplex", "triplex", "fourplex", "multiplex", "quadruplex", "4plex"]
 
+# Investment keywords set in bold in the summary sentence
+HIGHLIGHT_KEYWORDS = ["income", "rent", "investment", "cashflow", "tenant", "legal", "triplex", "duplex", "multiplex"]
+HIGHLIGHTS = KeywordMatcher(HIGHLIGHT_KEYWORDS)
+
+MULTIPLEX_QUERY = ListingQuery(f"building_type in ({', '.join(MULTIPLEX_TYPES)})")
+
 AVG_RENT_MAP = {
     "London": 1500,
     "Kitchener": 1700,
@@ -19,26 +41,6 @@ AVG_RENT_MAP = {
 
 url = "https://api2.realtor.ca/Listing.svc/PropertySearch_Post"
 
-headers = {
-    "accept": "*/*",
-    "accept-language": "en-US,en;q=0.9",
-    "content-type": "application/x-www-form-urlencoded; charset=UTF-8",
-    "origin": "https://www.realtor.ca",
-    "priority": "u=1, i",
-    "referer": "https://www.realtor.ca/",
-    "sec-ch-ua": '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
-    "sec-ch-ua-mobile": "?0",
-    "sec-ch-ua-platform": '"Windows"',
-    "sec-fetch-dest": "empty",
-    "sec-fetch-mode": "cors",
-    "sec-fetch-site": "same-site",
-    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
-}
-
-cookies = {
-    "reese84": "cookie"   # replace with your actual cookie value
-}
-
 #London
 dataLondon = {
     "ZoomLevel": "10",
@@ -111,147 +113,66 @@ dataBrantford = {
 # === FUNCTIONS ===
 
 # ===== STEP 1. Fetch Latest Dataset from Apify =====
-def fetch_dataset():
-    try:
-        all_listings = []
-        responseLondon = requests.post(url, headers=headers, cookies=cookies, data=dataLondon)
-        responseKWC = requests.post(url, headers=headers, cookies=cookies, data=dataKWC)
-        responseBrantford = requests.post(url, headers=headers, cookies=cookies, data=dataBrantford)
-        json_data_london = responseLondon.json()
-        json_data_kwc = responseKWC.json()
-        json_data_brantford = responseBrantford.json()
-
-        print("✅ JSON response received:")
-        #print(f"####################### London data #################### \n {json_data_london}")
-        #print(f"####################### KWC data #################### \n {json_data_kwc}")
-        #print(f"####################### Brantford data #################### \n {json_data_brantford}")
-
-    except ValueError:
-        print("⚠️ Response is not valid JSON. Here's the raw text:")
-        print(response.text)
-    
-    all_listings = json_data_london['Results']
-    all_listings.extend(json_data_kwc['Results'])
-    all_listings.extend(json_data_brantford['Results'])
-
+def fetch_dataset(incremental=False):
+    regions = {
+        "London": dataLondon,
+        "KWC": dataKWC,
+        "Brantford": dataBrantford,
+    }
+    response_cache.apply_cli_flags(url, regions)
+    all_listings, _ = fetch_tiled(url, regions, max_workers=MAX_CONCURRENT_REQUESTS,
+                                  rediscover="--retile" in sys.argv,
+                                  incremental=incremental,
+                                  transform=Listing.from_raw, projection=RAW_FIELDS)
     return all_listings
 
-    # return {
-    #     "listings_london": json_data_london,
-    #     "listings_kwc": json_data_kwc,
-    #     "listings_brantford": json_data_brantford
-    #     }
-
-
-def monthly_mortgage(principal, annual_rate=MORTGAGE_RATE, years=AMORT_YEARS):
-    monthly_rate = annual_rate / 12
-    n = years * 12
-    return principal * (monthly_rate * (1 + monthly_rate) ** n) / ((1 + monthly_rate) ** n - 1)
-
 
 def estimate_cashflow(price, units, city):
+    """price and units come already parsed from the Listing; no units means no estimate."""
     avg_rent = AVG_RENT_MAP.get(city, 1500)
-    try:
-        units = int(units)
-        price = int(str(price).replace("$", "").replace(",", ""))
-    except:
+    if not units:
         return None
 
-    monthly_income = units * avg_rent
-    mortgage_principal = price * (1 - DOWN_PAYMENT)
-    mortgage_payment = monthly_mortgage(mortgage_principal)
-    expenses = (price * 0.02) / 12
-    cashflow = monthly_income - (mortgage_payment + expenses)
+    cf = finance.multiplex_cashflows(price, units, avg_rent, DOWN_PAYMENT, MORTGAGE_RATE, AMORT_YEARS)
+    return {name: int(value) for name, value in cf.items()}
 
-    return {
-        "income": int(monthly_income),
-        "mortgage": int(mortgage_payment),
-        "expenses": int(expenses),
-        "cashflow": int(cashflow)
-    }
 
-def format_property(item):
-    building = item.get("Building", {}) or {}
-    property_info = item.get("Property", {}) or {}
-    address_info = property_info.get("Address", {}) or {}
-    amenities = property_info.get("AmmenitiesNearBy", "") or ""
+def estimate_cashflows(listings):
+    """estimate_cashflow for a batch of listings in one NumPy pass; None where a listing has no units."""
+    cf = finance.multiplex_cashflows(
+        [listing.price for listing in listings], [listing.units for listing in listings],
+        [AVG_RENT_MAP.get(listing.city or "Unknown", 1500) for listing in listings],
+        DOWN_PAYMENT, MORTGAGE_RATE, AMORT_YEARS)
+    # astype(int) truncates like int() did
+    columns = {name: values.astype(int).tolist() for name, values in cf.items()}
+    return [dict(zip(columns, row)) if listing.units else None
+            for listing, row in zip(listings, zip(*columns.values()))]
 
-    # --- Property type filter ---
-    prop_type = (building.get("Type") or "").strip()
-    if not prop_type:
-        return None
+def format_property(listing, cf=None):
+    """cf: this listing's estimate_cashflows() entry, estimated here when not given."""
+    amenities = listing.amenities
 
-    prop_type_norm = prop_type.lower().replace("-", "").replace(" ", "")
-    valid_types = [x.replace("-", "").replace(" ", "") for x in MULTIPLEX_TYPES]
-    if prop_type_norm not in valid_types:
+    # --- Property type filter ---
+    prop_type = listing.building_type
+    if not MULTIPLEX_QUERY.matches(listing):
         return None
 
     # --- Basic property details ---
-    price = property_info.get("Price", "N/A")
-    price_value = property_info.get("PriceUnformattedValue", 0)
-    if not price_value and isinstance(price, str) and "$" in price:
-        try:
-            price_value = int(price.replace("$", "").replace(",", "").strip())
-        except:
-            price_value = 0
-
-    units = building.get("UnitTotal") or building.get("TotalUnits") or "N/A"
-    beds = building.get("Bedrooms", "N/A")
-    baths = building.get("BathroomTotal", "N/A")
-
-    # --- Remarks cleanup ---
-    import re
-    remarks = item.get("PublicRemarks", "") or ""
-    address_text = address_info.get("AddressText", "")
-
-    # Try to parse address like: "415 CHATHAM Street|Brantford, Ontario N3S4J4"
-    city, province = "Unknown", "Unknown"
-    if "|" in address_text:
-        try:
-            parts = address_text.split("|")
-            # Usually: [street, "City, Province Postal"]
-            if len(parts) > 1:
-                second_part = parts[1]
-                # Split "Brantford, Ontario N3S4J4"
-                city_part = second_part.split(",")[0].strip()
-                city = city_part or "Unknown"
-                if "," in second_part:
-                    province = second_part.split(",")[1].split()[0].strip()
-        except Exception:
-            pass
-
-    city = (
-        address_info.get("City")
-        or address_info.get("Municipality")
-        or city
-        or "Unknown"
-    )
+    price = listing.price_text or "N/A"
+    units = listing.units or "N/A"
+    beds = listing.bedrooms_text or "N/A"
+    baths = listing.bathrooms or "N/A"
 
-    community = (
-        address_info.get("LocalLogicNeighbourHood")
-        or address_info.get("Subdivision")
-        or province
-        or "Unknown Area"
-    )
+    # City and province were parsed from "415 CHATHAM Street|Brantford, Ontario N3S4J4" at ingest
+    city = listing.city or "Unknown"
+    community = listing.neighbourhood or listing.province or "Unknown Area"
 
-    if address_text:
-        remarks = re.sub(re.escape(address_text), "", remarks, flags=re.IGNORECASE)
-    remarks = re.sub(r"\([A-Za-z0-9]+\)", "", remarks)
-    remarks = re.sub(r"\bWelcome to [^\n.?!]*[\n.?!-]+", "", remarks, flags=re.IGNORECASE)
-    remarks = remarks.strip()
-
-    # --- Extract first sentence with highlighted investment keywords ---
-    summary_remarks = ""
-    if remarks:
-        first_sentence = remarks.split(".")[0].strip()
-        keywords = ["income", "rent", "investment", "cashflow", "tenant", "legal", "triplex", "duplex", "multiplex"]
-        for kw in keywords:
-            if kw in first_sentence.lower():
-                first_sentence = re.sub(f"(?i)({kw})", r"*\1*", first_sentence)
-        summary_remarks = first_sentence + "."
+    # --- Remarks cleanup: first sentence with highlighted investment keywords ---
+    summary_remarks = remarks_cleanup.summarize(listing.remarks, listing.address_text, HIGHLIGHTS)
 
     # --- Estimate cashflow ---
-    cf = estimate_cashflow(price_value, units, city)
+    if cf is None:
+        cf = estimate_cashflow(listing.price, listing.units, city)
     if not cf:
         return None
 
@@ -301,20 +222,72 @@ def format_property(item):
         "city": city
     }
 
+
+def format_properties(listings):
+    """format_property over a batch: the type filter and all cashflows run once for the whole batch."""
+    table = ListingTable(listings)
+    entries = [None] * len(table)
+    matched = MULTIPLEX_QUERY.indices(table)
+    cfs = estimate_cashflows([table.listings[i] for i in matched])
+    for i, cf in zip(matched, cfs):
+        entries[i] = format_property(table.listings[i], cf)
+    return entries
+
 def prepare_whatsapp_message():
     # all_listings = []
-    all_listings = fetch_dataset()
-    city_groups = {}
+    # --from-store re-ranks the listings stored by earlier runs instead of refetching
+    if "--from-store" in sys.argv:
+        all_listings = listing_store.load_listings(source="multiplex-london-kwc-brantford")
+    else:
+        # --incremental still fetches everything once the last full fetch is FULL_RUN_DAYS old
+        incremental = "--incremental" in sys.argv and not listing_store.needs_full_run("multiplex-london-kwc-brantford")
+        started = time.time()
+        all_listings = fetch_dataset(incremental)
+        listing_store.save_listings(all_listings, source="multiplex-london-kwc-brantford")
+        # A full fetch saw every listing still for sale: stored rows it missed are no longer live
+        if not incremental:
+            listing_store.record_run("multiplex-london-kwc-brantford", started)
+        history.append_snapshot(all_listings, market="multiplex-london-kwc-brantford")
+        # An incremental fetch only returned what changed since the last run: rank it with the stored rest
+        if incremental:
+            all_listings = listing_store.load_listings(source="multiplex-london-kwc-brantford")
 
     # all_listings = listings['listings_london']['Results']
     # all_listings.extend(listings['listings_kwc']['Results'])
     # all_listings.extend(listings['listings_brantford']['Results'])
 
     
-    for item in all_listings:
-        prop = format_property(item)
-        if prop and prop["cashflow"] > 500:
-            city_groups.setdefault(prop["city"], []).append(prop)
+    # format_property only runs for listings whose HashCode changed since the last run
+    cache = ListingCache("multiplex-london-kwc-brantford", fingerprint=[
+        MORTGAGE_RATE, DOWN_PAYMENT, AMORT_YEARS, AVG_RENT_MAP, MULTIPLEX_QUERY.text, HIGHLIGHT_KEYWORDS,
+        # Filter and post template code: editing either re-renders every listing
+        source_version(__file__, Listing, ListingTable, ListingQuery, KeywordMatcher, remarks_cleanup, finance)])
+    props = cache.derive_batch(all_listings, format_properties)
+    cache.save()
+    cache.report()
+
+    matched = [listing for listing, prop in zip(all_listings, props) if prop]
+    kept = [prop for prop in props if prop]
+    inputs = sweep.multiplex_inputs(matched, AVG_RENT_MAP, 1500)
+    # --sweep: every rate x down payment x amortization x rent level over the multiplexes
+    if "--sweep" in sys.argv:
+        sweep.report(matched, *inputs, down_payment=DOWN_PAYMENT, years=AMORT_YEARS, cmhc=False, top_n=4)
+    # --montecarlo: cashflow percentiles under random rate paths, vacancy, rents and costs
+    if "--montecarlo" in sys.argv:
+        montecarlo.report(matched, *inputs, down_payment=DOWN_PAYMENT, rate=MORTGAGE_RATE, years=AMORT_YEARS,
+                          cmhc=False)
+
+    # Best 4 per city by cashflow, or with --pareto frontier listings first (cap rate,
+    # cash-on-cash, price/sqft, cashflow), best weighted score first
+    keys = [(prop["cashflow"],) for prop in kept]
+    if "--pareto" in sys.argv:
+        ranked = pareto.report(matched, *inputs, down_payment=DOWN_PAYMENT, rate=MORTGAGE_RATE, years=AMORT_YEARS,
+                               cmhc=False)
+        keys = list(zip(ranked["frontier"].tolist(), ranked["score"].tolist()))
+    # Bounded heaps per city, fed only listings clearing $500/mo
+    top_by_city = TopK(4, key=lambda i: keys[i], group=lambda i: kept[i]["city"])
+    top_by_city.extend(i for i, prop in enumerate(kept) if prop["cashflow"] > 500)
+    city_groups = {city: [kept[i] for i in best] for city, best in top_by_city.groups().items()}
 
     message = "🔥 Top Investment Opportunities 🔥\n\n"
 
@@ -325,7 +298,7 @@ def prepare_whatsapp_message():
         if city not in city_groups:
             continue
        ## message += f"📍 {city}\n"
-        top_props = sorted(city_groups[city], key=lambda x: x["cashflow"], reverse=True)[:4]
+        top_props = city_groups[city]
         for i, p in enumerate(top_props, start=1):
             message += f"{p['text']}\n"
 
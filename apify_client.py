@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import http_client
+import json_stream
+
+# ===== CONFIG =====
+APIFY_PAGE_SIZE = 500      # items per /items request
+STREAM_PARSE = True        # parse items off the socket instead of res.json()
+CHUNK_ITEMS = 1000         # items per chunk handed on by iter_chunks
+
+
+# ===== Dataset paging =====
+def items_params(offset, limit):
+    return {"offset": offset, "limit": limit, "format": "json"}
+
+
+def fetch_items_page(items_url, offset, limit, projection=None):
+    """GET one offset/limit window of a dataset's items."""
+    res = http_client.get(items_url, params=items_params(offset, limit))
+    res.raise_for_status()
+    return json_stream.project(res.json(), projection)
+
+
+def stream_items_page(items_url, offset, limit, projection=None):
+    """GET one offset/limit window and yield its items as each one is parsed."""
+    res = http_client.get(items_url, params=items_params(offset, limit), stream=True)
+    try:
+        res.raise_for_status()
+        stream = http_client.body_stream(res)
+        yield from json_stream.iter_results(stream, array_key=None, projection=projection)
+        http_client.drain(stream)
+    finally:
+        res.close()
+
+
+def iter_dataset_items(items_url, page_size=APIFY_PAGE_SIZE, prefetch=True, stream=STREAM_PARSE,
+                       projection=None):
+    """
+    Yield the items of an Apify dataset one by one, paging through
+    /items with offset/limit so only about one page is held in memory.
+
+    items_url is any Apify items endpoint, e.g.
+    .../datasets/{id}/items?token=... or .../actor-tasks/{task}/runs/last/dataset/items?token=...
+    With stream, items are handed over as they come off the socket (pages are then
+    read one after another); otherwise, with prefetch, the next page is requested
+    while the current one is consumed. With projection (e.g. listing.RAW_FIELDS)
+    items keep only those fields.
+    """
+    if stream:
+        offset = 0
+        while True:
+            count = 0
+            for item in stream_items_page(items_url, offset, page_size, projection):
+                count += 1
+                yield item
+            offset += count
+            if count < page_size:
+                return
+
+    offset = 0
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        next_page = pool.submit(fetch_items_page, items_url, offset, page_size, projection)
+        while next_page is not None:
+            items = next_page.result()
+            offset += len(items)
+            full_page = len(items) == page_size
+
+            if full_page and prefetch:
+                next_page = pool.submit(fetch_items_page, items_url, offset, page_size, projection)
+            else:
+                next_page = None
+
+            for item in items:
+                yield item
+            del items
+
+            if full_page and not prefetch:
+                next_page = pool.submit(fetch_items_page, items_url, offset, page_size, projection)
+
+
+def iter_chunks(items, size=CHUNK_ITEMS):
+    """
+    Yield lists of up to size items from an iterator such as iter_dataset_items(),
+    so each chunk can be saved and evaluated without holding the whole dataset.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
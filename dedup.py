@@ -0,0 +1,62 @@
+import threading
+
+# ===== Cross-region listing dedup =====
+def listing_keys(listing):
+    """Identity keys of a listing; a repeat of either one means the same listing."""
+    keys = []
+    if listing.get("Id"):
+        keys.append(("Id", str(listing["Id"])))
+    if listing.get("MlsNumber"):
+        keys.append(("MlsNumber", str(listing["MlsNumber"])))
+    return keys
+
+
+def market_of(region):
+    """Tiles are named "market/i"; overlap is reported per market."""
+    return region.split("/")[0]
+
+
+class Deduplicator:
+    """
+    Remembers every listing seen this run (by Id and MlsNumber) and which market
+    first returned it, so overlapping region boxes only pass each listing on once.
+    """
+
+    def __init__(self):
+        self.first_seen = {}        # key -> market that returned it first
+        self.fetched = {}           # market -> listings returned
+        self.overlap = {}           # market -> {earlier market: repeated listings}
+        self.lock = threading.Lock()
+
+    def add(self, region, results):
+        """Record a page of results and return only the listings not seen before."""
+        market = market_of(region)
+        fresh = []
+        with self.lock:
+            self.fetched[market] = self.fetched.get(market, 0) + len(results)
+            for listing in results:
+                keys = listing_keys(listing)
+                owner = next((self.first_seen[k] for k in keys if k in self.first_seen), None)
+                if owner is not None:
+                    counts = self.overlap.setdefault(market, {})
+                    counts[owner] = counts.get(owner, 0) + 1
+                    continue
+                for key in keys:
+                    self.first_seen[key] = market
+                fresh.append(listing)
+        return fresh
+
+    def unique(self, region, listings):
+        """Generator form of add() for streams of listings."""
+        for listing in listings:
+            yield from self.add(region, [listing])
+
+    def report(self):
+        for market, fetched in self.fetched.items():
+            counts = self.overlap.get(market, {})
+            repeated = sum(counts.values())
+            if not repeated:
+                continue
+            share = repeated / fetched * 100 if fetched else 0
+            detail = ", ".join(f"{other} {n}" for other, n in sorted(counts.items(), key=lambda x: -x[1]))
+            print(f"🔁 {market}: {repeated} of {fetched} listings ({share:.0f}%) already seen ({detail})")
@@ -0,0 +1,61 @@
+import json
+import os
+from datetime import datetime
+
+# ===== CONFIG =====
+WATERMARK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "watermarks.json")
+LAST_UPDATED_FORMAT = "%Y-%m-%d %I:%M:%S %p"     # e.g. "2025-09-19 8:24:55 AM"
+
+
+# ===== LastUpdated parsing =====
+def parse_last_updated(value):
+    """Parse a listing's LastUpdated string, or None when missing/unparseable."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), LAST_UPDATED_FORMAT)
+    except ValueError:
+        try:
+            return datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+
+
+def is_newer(listing, watermark):
+    """True when the listing changed after the watermark (or there is no watermark)."""
+    if watermark is None:
+        return True
+    updated = parse_last_updated(listing.get("LastUpdated"))
+    return updated is None or updated > watermark
+
+
+def newest(listings, current=None):
+    """Latest LastUpdated across listings, starting from the current watermark."""
+    latest = current
+    for listing in listings:
+        updated = parse_last_updated(listing.get("LastUpdated"))
+        if updated and (latest is None or updated > latest):
+            latest = updated
+    return latest
+
+
+# ===== Persisted per-market watermarks =====
+def load_watermarks(path=None):
+    """Return {market: datetime} from the last run, or {} on the first run."""
+    path = path or WATERMARK_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {market: datetime.fromisoformat(value) for market, value in raw.items() if value}
+
+
+def save_watermarks(watermarks, path=None):
+    path = path or WATERMARK_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    raw = {market: value.isoformat() for market, value in watermarks.items() if value}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(raw, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,239 @@
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import delta
+import http_client
+import json_stream
+import response_cache
+from dedup import Deduplicator
+
+# ===== CONFIG =====
+MAX_CONCURRENT_REQUESTS = 4
+STREAM_PARSE = True          # parse Results off the socket instead of response.json()
+
+
+# ===== Page fetching =====
+def read_body(stream, projection=None):
+    """
+    Stream-parse a PropertySearch_Post body into {"Results": [...], **other top-level keys},
+    keeping only the projected fields of each result when projection is given.
+    """
+    meta = {}
+    results = list(json_stream.iter_results(stream, "Results", meta, projection))
+    meta["Results"] = results
+    return meta
+
+
+def fetch_page(url, payload, page=1, headers=http_client.REALTOR_HEADERS,
+               cookies=http_client.REALTOR_COOKIES, market=None, projection=None):
+    """
+    POST one page of a region payload and return (json body, seconds taken).
+    The body is None when the page failed (offline miss, open breaker, HTTP
+    error, bad JSON), so callers can tell it from a genuinely empty page.
+    """
+    start = time.perf_counter()
+    page_payload = dict(payload, CurrentPage=str(page))
+
+    cached = response_cache.open_cached(url, page_payload, market)
+    if cached is not None:
+        with cached:
+            try:
+                return read_body(cached, projection), time.perf_counter() - start
+            except json_stream.JSON_ERRORS + (OSError, EOFError):
+                pass    # corrupt entry, fall through to the network
+    if response_cache.OFFLINE:
+        print(f"⚠️ {market} page {page}: not in the cache, skipped (offline)")
+        return None, time.perf_counter() - start
+
+    # A failed page is reported and skipped so the other regions' results survive
+    try:
+        response = http_client.post(url, headers=headers, cookies=cookies, data=page_payload,
+                                    stream=STREAM_PARSE)
+    except http_client.CircuitOpenError as e:
+        print(f"⚠️ {market} page {page}: skipped, {e}")
+        return None, time.perf_counter() - start
+    except http_client.TRANSPORT_ERRORS as e:
+        print(f"⚠️ {market} page {page}: request failed after retries: {e}")
+        return None, time.perf_counter() - start
+
+    try:
+        if response.status_code != 200:
+            print(f"⚠️ {market} page {page}: HTTP {response.status_code}, skipped")
+            return None, time.perf_counter() - start
+
+        # Parse Results as they arrive while teeing the raw bytes into the cache
+        writer = response_cache.CacheWriter(url, page_payload, market)
+        try:
+            if STREAM_PARSE:
+                stream = json_stream.TeeReader(http_client.body_stream(response), writer)
+                body = read_body(stream, projection)
+                http_client.drain(stream)
+            else:
+                writer.write(response.content)
+                body = response.json()
+                body["Results"] = json_stream.project(body.get("Results") or [], projection)
+        except json_stream.JSON_ERRORS + http_client.READ_ERRORS:
+            writer.discard()
+            print(f"⚠️ {market} page {page}: response is not valid JSON, skipped")
+            return None, time.perf_counter() - start
+        writer.commit()
+    finally:
+        response.close()
+
+    return body, time.perf_counter() - start
+
+
+def total_pages(body, payload):
+    """Read the page count from the Paging block of a first-page response."""
+    paging = body.get("Paging") or {}
+    if paging.get("TotalPages"):
+        return int(paging["TotalPages"])
+    total_records = int(paging.get("TotalRecords") or 0)
+    per_page = int(paging.get("RecordsPerPage") or payload.get("RecordsPerPage", 100))
+    return max(1, math.ceil(total_records / per_page))
+
+
+# ===== Concurrent region + page fetching =====
+def iter_region_pages(url, regions, headers=http_client.REALTOR_HEADERS,
+                      cookies=http_client.REALTOR_COOKIES,
+                      max_workers=MAX_CONCURRENT_REQUESTS, early_stop=True, watermarks=None,
+                      dedup=None, projection=None):
+    """
+    Fetch page 1 of every region at once, then the remaining pages of each region
+    as soon as its paging metadata is known, never more than max_workers in flight.
+    Each region keeps at most max_workers pages queued ahead, so stopping a region
+    wastes little work.
+
+    Yields (region name, page number, results, seconds taken) as each page finishes;
+    results is None for a page that failed.
+    Listings already returned by any region (same Id or MlsNumber) are dropped as
+    pages arrive, through dedup (a dedup.Deduplicator shared with the caller).
+    With early_stop, a region stops paging once a page brings only listings that
+    were already seen. With watermarks ({region: datetime}), results are
+    newest-first (Sort=6-D), so a region stops at the first page reaching its
+    watermark and only listings updated after it are yielded.
+    """
+    watermarks = watermarks or {}
+    dedup = dedup or Deduplicator()
+    window = max(1, max_workers)
+
+    with ThreadPoolExecutor(max_workers=window) as pool:
+        pending = {}
+        state = {name: {"next": 2, "last": 1, "stopped": False} for name in regions}
+
+        def schedule(name):
+            st = state[name]
+            in_flight = sum(1 for region, _ in pending.values() if region == name)
+            while not st["stopped"] and st["next"] <= st["last"] and in_flight < window:
+                future = pool.submit(fetch_page, url, regions[name], st["next"], headers, cookies, name,
+                                     projection)
+                pending[future] = (name, st["next"])
+                st["next"] += 1
+                in_flight += 1
+
+        def stop(name, page):
+            state[name]["stopped"] = True
+            cancel_region(pending, name, after_page=page)
+
+        for name, payload in regions.items():
+            future = pool.submit(fetch_page, url, payload, 1, headers, cookies, name, projection)
+            pending[future] = (name, 1)
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, page = pending.pop(future)
+                    if future.cancelled():
+                        continue
+                    body, elapsed = future.result()
+                    if body is None:
+                        schedule(name)
+                        yield name, page, None, elapsed
+                        continue
+                    results = body.get("Results", []) or []
+
+                    if page == 1:
+                        state[name]["last"] = total_pages(body, regions[name])
+
+                    watermark = watermarks.get(name)
+                    if watermark is not None:
+                        fresh = [r for r in results if delta.is_newer(r, watermark)]
+                        if len(fresh) < len(results):
+                            stop(name, page)
+                        results = fresh
+
+                    fresh = dedup.add(name, results)
+                    if early_stop and results and not fresh:
+                        stop(name, page)
+                    results = fresh
+
+                    schedule(name)
+                    yield name, page, results, elapsed
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def cancel_region(pending, name, after_page=0):
+    """Cancel the not-yet-started page requests of one region beyond after_page."""
+    for future, (region, page) in list(pending.items()):
+        if region == name and page > after_page and future.cancel():
+            del pending[future]
+
+
+def fetch_regions(url, regions, headers=http_client.REALTOR_HEADERS,
+                  cookies=http_client.REALTOR_COOKIES,
+                  max_workers=MAX_CONCURRENT_REQUESTS, early_stop=True, incremental=False,
+                  transform=None, projection=None):
+    """
+    Fetch every page of every region payload concurrently and merge the Results.
+
+    regions is a dict of region name -> PropertySearch_Post form payload.
+    With incremental, only listings updated since the previous incremental run
+    are returned and paging stops at the persisted per-region watermark. A
+    region with a failed page keeps its old watermark, so the listings on that
+    page are fetched again next run instead of being skipped for good.
+    With transform (e.g. listing.Listing.from_raw), each result is converted as
+    its page arrives so the raw dicts are not kept; with projection (e.g.
+    listing.RAW_FIELDS) only those fields of each result are decoded at all.
+    Returns (all_listings, timings) where timings maps region name -> seconds
+    spent on that region's requests.
+    """
+    all_listings = []
+    timings = {name: 0.0 for name in regions}
+    watermarks = delta.load_watermarks() if incremental else {}
+    new_watermarks = dict(watermarks)
+    failed = set()
+    dedup = Deduplicator()
+    start = time.perf_counter()
+
+    for name, page, results, elapsed in iter_region_pages(
+            url, regions, headers, cookies, max_workers, early_stop, watermarks, dedup, projection):
+        timings[name] += elapsed
+        if results is None:
+            failed.add(name)
+            continue
+        new_watermarks[name] = delta.newest(results, new_watermarks.get(name))
+        all_listings.extend(map(transform, results) if transform else results)
+        print(f"✅ {name} page {page}: {len(results)} listings in {elapsed:.2f}s")
+
+    print_timings(timings, time.perf_counter() - start)
+    dedup.report()
+    http_client.print_connection_stats()
+    if incremental:
+        for name in failed:
+            new_watermarks[name] = watermarks.get(name)
+        if failed:
+            print(f"⚠️ Watermarks kept for {len(failed)} region(s) with failed pages: {', '.join(sorted(failed))}")
+        delta.save_watermarks(new_watermarks)
+    return all_listings, timings
+
+
+def print_timings(timings, wall_time):
+    """Compare the concurrent wall time against the sequential (summed) path."""
+    sequential = sum(timings.values())
+    speedup = sequential / wall_time if wall_time else 0
+    print(f"⏱️ Fetched {len(timings)} regions in {wall_time:.2f}s "
+          f"(sequential would be ~{sequential:.2f}s, {speedup:.1f}x speedup)")
@@ -0,0 +1,116 @@
+from functools import lru_cache
+
+import numpy as np
+
+# ===== CONFIG =====
+# CMHC mortgage insurance premium by down payment: (down payment below, premium rate)
+CMHC_TIERS = ((0.10, 0.04), (0.15, 0.031), (0.20, 0.028))
+MONTHLY_UTILITIES = 300.0
+MONTHLY_INS_MISC = 200.0
+EXPENSE_RATIO = 0.02       # multiplex yearly expenses as a share of price
+
+
+# ===== Mortgage maths =====
+@lru_cache(maxsize=None)
+def annuity_factor(rate, years):
+    """Monthly payment per dollar borrowed at an annual rate over years of amortization."""
+    monthly_rate = rate / 12
+    n_payments = years * 12
+    if monthly_rate == 0:
+        return 1 / n_payments
+    growth = (1 + monthly_rate) ** n_payments
+    return monthly_rate * growth / (growth - 1)
+
+
+def annuity_factors(rates, years):
+    """annuity_factor over arrays of rates and/or years (grids and solvers)."""
+    monthly_rate = np.asarray(rates, dtype=float) / 12
+    n_payments = np.asarray(years, dtype=float) * 12
+    growth = (1 + monthly_rate) ** n_payments
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factors = monthly_rate * growth / (growth - 1)
+    return np.where(monthly_rate == 0, 1 / n_payments, factors)
+
+
+def cmhc_premium_rate(downpayment_percent):
+    """CMHC premium rate for a down payment share; works on scalars and arrays."""
+    down = np.asarray(downpayment_percent, dtype=float)
+    rates = np.select([down < limit for limit, _ in CMHC_TIERS], [rate for _, rate in CMHC_TIERS], 0.0)
+    return rates if rates.ndim else float(rates)
+
+
+def mortgage_payments(prices, downpayment_percent, rate, years, cmhc=True):
+    """
+    Monthly payments and down payments, with CMHC insurance added to the
+    mortgage below 20% down unless cmhc is False. prices and downpayment_percent broadcast, e.g.
+    prices[:, None] against an array of down payments gives one column per scenario.
+    """
+    prices = np.asarray(prices, dtype=float)
+    down = np.asarray(downpayment_percent, dtype=float)
+    downpayment = prices * down
+    premium = cmhc_premium_rate(down) if cmhc else 0.0
+    mortgage_amount = (prices - downpayment) * (1 + premium)
+    return mortgage_amount * annuity_factor(rate, years), downpayment
+
+
+# ===== Batch cashflows =====
+def residential_cashflows(prices, tax_amounts, downpayment_percents, total_rent, rate, years,
+                          utilities=MONTHLY_UTILITIES, ins_misc=MONTHLY_INS_MISC):
+    """
+    Payments and cashflows of every listing under every down payment in one pass.
+    Returns arrays: "payment" and "downpayment" (listings x down payments),
+    "monthly_tax" (listings), "cashflow" (listings x down payments, after tax,
+    utilities and insurance) and "cashflow_before_costs" (rent - payment only).
+    """
+    prices = np.asarray(prices, dtype=float)
+    payment, downpayment = mortgage_payments(prices[:, None], np.asarray(downpayment_percents), rate, years)
+    monthly_tax = np.asarray(tax_amounts, dtype=float) / 12
+    costs = monthly_tax + utilities + ins_misc
+    return {
+        "payment": payment,
+        "downpayment": downpayment,
+        "monthly_tax": monthly_tax,
+        "cashflow": total_rent - (payment + costs[:, None]),
+        "cashflow_before_costs": total_rent - payment,
+    }
+
+
+def multiplex_cashflows(prices, units, rents_per_unit, downpayment_percent, rate, years,
+                        expense_ratio=EXPENSE_RATIO):
+    """
+    Monthly income, mortgage, expenses and cashflow of every multiplex at once;
+    units and rents_per_unit are per listing. No CMHC insurance is assumed, as
+    in the original multiplex estimate.
+    """
+    prices = np.asarray(prices, dtype=float)
+    income = np.asarray(units, dtype=float) * np.asarray(rents_per_unit, dtype=float)
+    mortgage = prices * (1 - downpayment_percent) * annuity_factor(rate, years)
+    expenses = prices * expense_ratio / 12
+    return {
+        "income": income,
+        "mortgage": mortgage,
+        "expenses": expenses,
+        "cashflow": income - (mortgage + expenses),
+    }
+
+
+def investment_metrics(prices, rents, costs, downpayment_percent, rate, years, sqft=None, cmhc=True):
+    """
+    Per listing, from monthly rents and non-mortgage costs: "cap_rate" (yearly
+    rent less costs over price), "cashflow" (monthly, after the mortgage),
+    "cash_on_cash" (yearly cashflow over the down payment) and "price_per_sqft"
+    (NaN where the interior size is unknown). cmhc=False leaves out CMHC
+    insurance, as the multiplex estimates do.
+    """
+    prices = np.asarray(prices, dtype=float)
+    net = np.asarray(rents, dtype=float) - np.asarray(costs, dtype=float)
+    payment, downpayment = mortgage_payments(prices, downpayment_percent, rate, years, cmhc)
+    cashflow = net - payment
+    sqft = np.full(len(prices), np.nan) if sqft is None else np.asarray(sqft, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "cap_rate": np.where(prices > 0, net * 12 / prices, np.nan),
+            "cashflow": cashflow,
+            "cash_on_cash": np.where(downpayment > 0, cashflow * 12 / downpayment, np.nan),
+            "price_per_sqft": np.where(sqft > 0, prices / sqft, np.nan),
+        }
@@ -0,0 +1,118 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+
+# ===== CONFIG =====
+HASH_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "hashcodes")
+MAX_UNSEEN_DAYS = 30       # forget listings that have not come back for this long
+
+
+# ===== Fingerprints =====
+def source_version(*sources):
+    """
+    Short hash of the source files of sources (paths, modules, classes or
+    functions), for fingerprints of values rendered by code such as a post template.
+    """
+    digest = hashlib.sha256()
+    for source in sources:
+        path = source if isinstance(source, str) else inspect.getfile(source)
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# ===== Per-listing results keyed by HashCode =====
+class ListingCache:
+    """
+    Persists, per script, each listing's HashCode and the value derived from it
+    (filtered record, score, rendered post ...), so listings that did not change
+    since the last run are served from the cache instead of being processed again.
+
+    fingerprint is anything JSON-serialisable describing everything the derived
+    values depend on (rates, rents, filter queries, keyword lists and a
+    source_version() of the rendering code); when it changes the whole cache is dropped.
+    """
+
+    def __init__(self, name, fingerprint=None, cache_dir=None):
+        self.path = os.path.join(cache_dir or HASH_CACHE_DIR, f"{name}.json")
+        self.fingerprint = json.loads(json.dumps(fingerprint))
+        self.entries = {}
+        self.reused = 0
+        self.processed = 0
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get("fingerprint") == self.fingerprint:
+            self.entries = saved.get("listings", {})
+
+    def cached(self, listing, now):
+        """The cached value entry for an unchanged listing, else None."""
+        if not listing.id or not listing.hash_code:
+            return None
+        entry = self.entries.get(listing.id)
+        if entry is None or entry["hash"] != listing.hash_code:
+            return None
+        self.reused += 1
+        entry["seen"] = now
+        return entry
+
+    def remember(self, listing, value, now):
+        self.processed += 1
+        if listing.id and listing.hash_code:
+            self.entries[listing.id] = {"hash": listing.hash_code, "value": value, "seen": now}
+
+    def derive(self, listings, fn):
+        """
+        Yield fn(listing) for every listing.Listing, calling fn only for listings
+        whose HashCode changed (or that have no Id/HashCode to key on).
+        """
+        now = time.time()
+        for listing in listings:
+            entry = self.cached(listing, now)
+            if entry is not None:
+                yield entry["value"]
+                continue
+            value = fn(listing)
+            self.remember(listing, value, now)
+            yield value
+
+    def derive_batch(self, listings, fn):
+        """
+        Like derive(), but fn receives all changed listings at once and returns
+        one value per listing, so it can work on the batch as a whole (e.g. a
+        listing_table.ListingTable). Returns the values in input order.
+        """
+        now = time.time()
+        listings = list(listings)
+        values = [None] * len(listings)
+        changed = []
+        for i, listing in enumerate(listings):
+            entry = self.cached(listing, now)
+            if entry is None:
+                changed.append(i)
+            else:
+                values[i] = entry["value"]
+
+        derived = fn([listings[i] for i in changed])
+        for i, value in zip(changed, derived):
+            self.remember(listings[i], value, now)
+            values[i] = value
+        return values
+
+    def save(self):
+        cutoff = time.time() - MAX_UNSEEN_DAYS * 24 * 60 * 60
+        listings = {k: v for k, v in self.entries.items() if v["seen"] >= cutoff}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "listings": listings}, f)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        total = self.reused + self.processed
+        print(f"♻️ {self.reused} of {total} listings unchanged since last run, {self.processed} processed")
@@ -0,0 +1,174 @@
+"""
+Per-run Parquet snapshots of normalised listings, for price cut and days on
+market history across runs.
+
+    .cache/history/date=2026-10-17/market=halton/part-083012.parquet
+
+    python history.py                    # biggest price cuts across all snapshots
+    python history.py --market halton --since 2026-08-01
+"""
+import argparse
+import os
+from datetime import date, datetime
+
+import numpy as np
+
+from ranking import top_k
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# ===== CONFIG =====
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "history")
+
+# Listing attribute -> Arrow type of its snapshot column
+SNAPSHOT_FIELDS = {
+    "id": "string",
+    "mls_number": "string",
+    "last_updated": "string",
+    "building_type": "string",
+    "city": "string",
+    "area": "string",
+    "price": "float64",
+    "tax_amount": "float64",
+    "bedrooms": "int16",
+    "bathrooms": "int16",
+    "parking": "int16",
+    "units": "int16",
+}
+# Low-cardinality strings are dictionary-encoded in the Parquet files
+DICTIONARY_FIELDS = ["building_type", "city", "area"]
+
+_warned = False
+
+
+def available():
+    """pyarrow is optional; without it snapshots are skipped with a notice."""
+    global _warned
+    if pa is None and not _warned:
+        print("⚠️ pyarrow is not installed, listing history is not recorded")
+        _warned = True
+    return pa is not None
+
+
+# ===== Writes =====
+def append_snapshot(listings, market, run_date=None, path=None):
+    """
+    Write this run's listings as one Parquet file in the date=/market= partition.
+    Returns the file written, or None when pyarrow is missing or there is nothing to write.
+    """
+    if not available():
+        return None
+    listings = list(listings)
+    if not listings:
+        return None
+
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in SNAPSHOT_FIELDS.items()])
+    columns = {name: [getattr(listing, name) for listing in listings] for name in SNAPSHOT_FIELDS}
+    table = pa.table(columns, schema=schema)
+
+    run_date = run_date or date.today()
+    directory = os.path.join(path or HISTORY_DIR, f"date={run_date.isoformat()}", f"market={market}")
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f"part-{datetime.now():%H%M%S%f}.parquet")
+    pq.write_table(table, file_path, use_dictionary=DICTIONARY_FIELDS, compression="zstd")
+    return file_path
+
+
+# ===== Reads =====
+def read_history(columns=None, market=None, since=None, path=None):
+    """
+    Read snapshot rows as a pyarrow Table through memory-mapped files, with
+    partition pruning on market and date (since is an ISO date string).
+    The partition keys come back as the "date" and "market" columns.
+    """
+    if not available():
+        return None
+    path = path or HISTORY_DIR
+    if not os.path.isdir(path):
+        return None
+
+    filters = []
+    if market:
+        filters.append(("market", "=", market))
+    if since:
+        filters.append(("date", ">=", since))
+    # Explicit string partition keys, so ISO dates compare as text
+    partitioning = ds.partitioning(pa.schema([("date", pa.string()), ("market", pa.string())]),
+                                   flavor="hive")
+    return pq.read_table(path, columns=columns, filters=filters or None,
+                         partitioning=partitioning, memory_map=True)
+
+
+def price_changes(market=None, since=None, path=None):
+    """
+    Per MlsNumber: first and latest list price, the change between them, and the
+    days between the first and latest snapshot that saw it. Sorted biggest cut first.
+    """
+    rows, changes = _price_change_rows(market, since, path)
+    return [rows(i) for i in np.argsort(changes, kind="stable")]
+
+
+def top_price_cuts(k, per=None, market=None, since=None, path=None):
+    """
+    The k biggest price cuts overall, or per group when per names a row field
+    ("city", "market"), e.g. {"Milton": [...], "Oakville": [...]}. Uses bounded
+    heaps instead of sorting every MlsNumber.
+    """
+    rows, changes = _price_change_rows(market, since, path)
+    cuts = (rows(i) for i in np.flatnonzero(changes < 0))
+    return top_k(cuts, k, key="-change", group=(lambda row: row[per]) if per else None)
+
+
+def _price_change_rows(market, since, path):
+    """(row(i) building the i-th MlsNumber's dict, array of price changes per MlsNumber)."""
+    table = read_history(["mls_number", "price", "date", "city", "market"], market, since, path)
+    if table is None or table.num_rows == 0:
+        return None, np.empty(0)
+
+    table = table.sort_by([("mls_number", "ascending"), ("date", "ascending")])
+    mls = table.column("mls_number").to_numpy(zero_copy_only=False)
+    prices = table.column("price").to_numpy(zero_copy_only=False)
+    days = np.array(table.column("date").to_pylist(), dtype="datetime64[D]")
+    cities = table.column("city").to_numpy(zero_copy_only=False)
+    markets = table.column("market").to_numpy(zero_copy_only=False)
+
+    # Rows are grouped by MlsNumber; each group runs from starts[i] to ends[i]
+    starts = np.flatnonzero(np.r_[True, mls[1:] != mls[:-1]])
+    ends = np.r_[starts[1:], len(mls)] - 1
+    change = prices[ends] - prices[starts]
+    on_market = (days[ends] - days[starts]).astype(int)
+
+    def row(i):
+        return {
+            "mls_number": mls[starts[i]],
+            "city": cities[ends[i]],
+            "market": markets[ends[i]],
+            "first_price": float(prices[starts[i]]),
+            "last_price": float(prices[ends[i]]),
+            "change": float(change[i]),
+            "days_on_market": int(on_market[i]),
+            "snapshots": int(ends[i] - starts[i] + 1),
+        }
+    return row, change
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price changes across listing snapshots")
+    parser.add_argument("--market", help="e.g. halton, brampton-750k-1m")
+    parser.add_argument("--since", help="first snapshot date to include (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--per", choices=["city", "market"], help="top cuts per city or market")
+    args = parser.parse_args()
+
+    groups = top_price_cuts(args.top, args.per, args.market, args.since)
+    for group, rows in (groups.items() if args.per else [(None, groups)]):
+        if group is not None:
+            print(f"📍 {group}")
+        for row in rows:
+            print(f"📉 {row['mls_number']} {row['city']}: ${row['first_price']:,.0f} -> ${row['last_price']:,.0f} "
+                  f"({row['change']:+,.0f}) over {row['days_on_market']} days")
@@ -0,0 +1,412 @@
+import io
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+except ImportError:
+    httpx = None
+
+# ===== CONFIG =====
+USE_HTTP2 = True             # only takes effect when httpx + h2 are installed
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = (5, 30)    # (connect, read) seconds
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5          # seconds, doubled on every retry (full jitter)
+MAX_BACKOFF = 30             # seconds
+RETRY_STATUSES = (403, 429, 500, 502, 503, 504)
+
+# Token bucket per host: (requests per second, burst)
+DEFAULT_RATE_LIMIT = (5, 5)
+HOST_RATE_LIMITS = {
+    "api2.realtor.ca": (2, 4),
+    "api.apify.com": (10, 10),
+}
+
+BREAKER_FAILURES = 5         # consecutive failures before a host's circuit opens
+BREAKER_COOLDOWN = 60        # seconds before a half-open trial request is let through
+
+# Send realtor.ca / apify.com traffic to a local mock_server.py instead (e.g. http://127.0.0.1:8099)
+MOCK_SERVER_URL = os.getenv("MOCK_SERVER_URL")
+MOCKED_HOSTS = ("api2.realtor.ca", "api.apify.com")
+
+HOST_POOL_SIZES = {
+    "api2.realtor.ca": 8,
+    "api.apify.com": 4,
+}
+
+HOST_TIMEOUTS = {
+    "api2.realtor.ca": (5, 30),
+    "api.apify.com": (5, 120),
+}
+
+REALTOR_HEADERS = {
+    "accept": "*/*",
+    "accept-language": "en-US,en;q=0.9",
+    "content-type": "application/x-www-form-urlencoded; charset=UTF-8",
+    "origin": "https://www.realtor.ca",
+    "priority": "u=1, i",
+    "referer": "https://www.realtor.ca/",
+    "sec-ch-ua": '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-site",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
+}
+
+REALTOR_COOKIES = {
+    "reese84": "cookie"   # replace with your actual cookie value
+}
+
+TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout)
+if httpx:
+    TRANSPORT_ERRORS += (httpx.TransportError,)
+
+# Errors raised while reading a stream=True body after the headers arrived
+READ_ERRORS = TRANSPORT_ERRORS + (requests.RequestException, urllib3.exceptions.HTTPError)
+
+_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while a host's circuit breaker is open."""
+
+
+# ===== Rate governor =====
+class TokenBucket:
+    """Thread-safe token bucket shared by every request to one host."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+# ===== Circuit breaker =====
+class CircuitBreaker:
+    """
+    Opens after BREAKER_FAILURES consecutive failures so callers fail fast; after
+    BREAKER_COOLDOWN one trial request is allowed, and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, host, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.host = host
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                raise CircuitOpenError(f"circuit open for {self.host}")
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.max_failures:
+                if self.opened_at is None or self.trial_running:
+                    print(f"🚫 {self.host}: circuit open after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self.trial_running = False
+
+
+_governors = {}
+_breakers = {}
+
+
+def governor_for(host):
+    with _lock:
+        if host not in _governors:
+            _governors[host] = TokenBucket(*HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT))
+        return _governors[host]
+
+
+def breaker_for(host):
+    with _lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+# ===== Pooled session =====
+class TrackingAdapter(HTTPAdapter):
+    """HTTPAdapter that remembers the urllib3 pools it hands out, for reuse stats."""
+
+    def __init__(self, *args, **kwargs):
+        self.pools = {}
+        super().__init__(*args, **kwargs)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+        self.pools[pool.host] = pool
+        return pool
+
+
+if httpx:
+    class TrackingTransport(httpx.HTTPTransport):
+        """HTTP/2 transport that counts the connections it opens per host connected to, for reuse stats."""
+
+        def __init__(self, *args, **kwargs):
+            self.connections = {}
+            super().__init__(*args, **kwargs)
+
+        def handle_request(self, request):
+            host = request.url.host
+
+            def trace(event, info):
+                if event == "connection.connect_tcp.complete":
+                    with _lock:
+                        self.connections[host] = self.connections.get(host, 0) + 1
+
+            request.extensions = dict(request.extensions, trace=trace)
+            return super().handle_request(request)
+
+
+_session = None
+_http2_clients = {}
+_http2_transports = {}
+_request_counts = {}
+_http2_hosts = set()       # hosts that actually answered over HTTP/2
+
+
+def pool_size(host):
+    return HOST_POOL_SIZES.get(host, DEFAULT_POOL_SIZE)
+
+
+def timeout_for(host):
+    return HOST_TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+
+
+def get_session():
+    """Return the process-wide keep-alive session, creating it on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            for host in HOST_POOL_SIZES:
+                adapter = TrackingAdapter(pool_connections=1, pool_maxsize=pool_size(host))
+                session.mount(f"https://{host}/", adapter)
+            default_adapter = TrackingAdapter(pool_maxsize=DEFAULT_POOL_SIZE)
+            session.mount("https://", default_adapter)
+            session.mount("http://", default_adapter)
+            _session = session
+        return _session
+
+
+def get_http2_client(host):
+    """Return the shared HTTP/2 client for a host, or None when HTTP/2 is unavailable."""
+    if not (USE_HTTP2 and httpx):
+        return None
+    with _lock:
+        if host not in _http2_clients:
+            size = pool_size(host)
+            connect, read = timeout_for(host)
+            # An explicit transport ignores the client's limits=, so the pool size goes here
+            transport = TrackingTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            )
+            _http2_transports[host] = transport
+            _http2_clients[host] = httpx.Client(timeout=httpx.Timeout(read, connect=connect),
+                                                transport=transport)
+        return _http2_clients[host]
+
+
+def send(method, url, host, **kwargs):
+    """One attempt over the shared pool for the host, without throttling or retries."""
+    client = get_http2_client(host)
+    if client is not None:
+        stream = kwargs.pop("stream", False)
+        cookies = kwargs.pop("cookies", None)
+        if cookies:
+            client.cookies.update(cookies)
+        # stream=True leaves the body on the socket for body_stream(), as requests does
+        return client.send(client.build_request(method, url, **kwargs), stream=stream)
+
+    kwargs.setdefault("timeout", timeout_for(host))
+    return get_session().request(method, url, **kwargs)
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the shared pool for the URL's host. Every attempt takes
+    a token from the host's rate governor; retryable statuses and transport errors
+    are retried with exponential backoff plus jitter. Raises CircuitOpenError
+    without sending when the host's breaker is open, and the last transport error
+    once retries run out.
+    """
+    host = urlsplit(url).hostname or ""
+    url = mocked_url(url)
+    # Stats are kept per host actually connected to (the mock server when mocked),
+    # the same key the connection pools use
+    target = urlsplit(url).hostname or ""
+    breaker = breaker_for(host)
+    governor = governor_for(host)
+
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.before_request()
+        governor.acquire()
+        with _lock:
+            _request_counts[target] = _request_counts.get(target, 0) + 1
+
+        try:
+            response = send(method, url, host, **dict(kwargs))
+        except TRANSPORT_ERRORS:
+            breaker.record_failure()
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+
+        if getattr(response, "http_version", None) == "HTTP/2":
+            with _lock:
+                _http2_hosts.add(target)
+        if response.status_code not in RETRY_STATUSES:
+            breaker.record_success()
+            return response
+
+        breaker.record_failure()
+        if attempt == MAX_RETRIES:
+            return response
+        response.close()
+        time.sleep(backoff_delay(attempt, response.headers.get("Retry-After")))
+
+
+def mocked_url(url):
+    """Point realtor.ca / apify.com URLs at MOCK_SERVER_URL when it is set."""
+    parts = urlsplit(url)
+    if not MOCK_SERVER_URL or parts.hostname not in MOCKED_HOSTS:
+        return url
+    mock = urlsplit(MOCK_SERVER_URL)
+    return urlunsplit((mock.scheme, mock.netloc, parts.path, parts.query, parts.fragment))
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, or the server's Retry-After if given."""
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(MAX_BACKOFF, RETRY_BACKOFF * 2 ** attempt))
+
+
+class IterStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks (an httpx streamed body)."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            self.pending = next(self.chunks, b"")
+            if not self.pending:
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def body_stream(response):
+    """Binary file object over a response body, for incremental parsing of stream=True responses."""
+    if hasattr(response, "raw") and hasattr(response.raw, "read"):
+        response.raw.decode_content = True
+        return response.raw
+    if httpx and isinstance(response, httpx.Response) and not response.is_stream_consumed:
+        return IterStream(response.iter_bytes())
+    return io.BytesIO(response.content)
+
+
+def drain(stream, chunk_size=64 * 1024):
+    """
+    Read a body stream to EOF. A parser stops at the closing bracket; closing a
+    response with bytes left unread drops its connection instead of pooling it.
+    """
+    while stream.read(chunk_size):
+        pass
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+# ===== Connection reuse stats =====
+def connection_stats():
+    """
+    Per-host request and connection counts, keyed by the host connected to.
+    reused is the number of requests that went over an already-open connection
+    instead of a new TCP+TLS handshake; http2 is set when responses came over HTTP/2.
+    """
+    stats = {host: {"requests": count, "connections": 0, "reused": 0}
+             for host, count in _request_counts.items()}
+
+    if _session is not None:
+        adapters = {id(a): a for a in _session.adapters.values()}.values()
+        for adapter in adapters:
+            for host, pool in getattr(adapter, "pools", {}).items():
+                entry = stats.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+                entry["connections"] += pool.num_connections
+
+    for transport in _http2_transports.values():
+        for host, count in transport.connections.items():
+            entry = stats.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+            entry["connections"] += count
+
+    for host, entry in stats.items():
+        entry["reused"] = max(0, entry["requests"] - entry["connections"])
+        entry["http2"] = host in _http2_hosts
+    return stats
+
+
+def print_connection_stats():
+    for host, entry in connection_stats().items():
+        over = " over HTTP/2" if entry.get("http2") else ""
+        print(f"🔌 {host}: {entry['requests']} requests, {entry['connections']} connections "
+              f"opened, {entry['reused']} reused{over}")
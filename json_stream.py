@@ -0,0 +1,301 @@
+import codecs
+import json
+import re
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:
+    ijson = None
+
+# ===== CONFIG =====
+CHUNK_SIZE = 64 * 1024
+# The default reader hands each listing to the C json decoder (raw_decode) and
+# measured ~3x faster than ijson's event stream on 100-record pages; set this to
+# use ijson instead (only takes effect when ijson is installed).
+USE_IJSON = False
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that can still extend a number ("9." + "5", "1e" + "3")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_KEY = re.compile(r'[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*')
+# Everything up to the next bracket that is not inside a string; stops at a
+# quote whose string is cut off at the buffer end
+_SKIP_RUN = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_decoder = json.JSONDecoder()
+
+# Errors either backend raises on malformed or truncated input
+JSON_ERRORS = (ValueError, ijson.JSONError) if ijson else (ValueError,)
+
+
+# ===== Public API =====
+def iter_results(stream, array_key="Results", meta=None, projection=None):
+    """
+    Yield the elements of a top-level array straight off a file-like stream,
+    each one as soon as it is complete, without building the whole document.
+
+    For an object body (PropertySearch_Post) array_key names the array to stream
+    and every other top-level value is stored in meta (e.g. meta["Paging"]).
+    For an array body (Apify items) pass array_key=None.
+
+    With projection, each element keeps only the projected keys and the other
+    subtrees are skipped over in the text without being decoded (see project()).
+    """
+    if meta is None:
+        meta = {}
+    if USE_IJSON and ijson is not None:
+        results = _iter_ijson(stream, array_key, meta)
+        return (project(r, projection) for r in results) if projection else results
+    return _iter_raw_decode(stream, array_key, meta, projection)
+
+
+def project(value, projection):
+    """
+    Keep only the projected parts of an already decoded value.
+
+    A projection is a dict of key -> True (keep the whole value) or a nested
+    projection; a nested projection applied to a list applies to each element,
+    and one wrapped in a list ([projection]) keeps only the first element.
+    e.g. {"Id": True, "Property": {"Price": True, "Photo": [{"HighResPath": True}]}}
+    """
+    if not projection:
+        return value
+    if isinstance(projection, list):
+        if isinstance(value, list):
+            return [project(value[0], projection[0])] if value else []
+        return project(value, projection[0])
+    if isinstance(value, dict):
+        kept = {}
+        for key, sub in projection.items():
+            if key in value:
+                kept[key] = value[key] if sub is True else project(value[key], sub)
+        return kept
+    if isinstance(value, list):
+        return [project(item, projection) for item in value]
+    return value
+
+
+class TeeReader:
+    """File-like wrapper that copies every chunk read into a sink (e.g. a CacheWriter)."""
+
+    def __init__(self, stream, sink):
+        self.stream = stream
+        self.sink = sink
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        if chunk:
+            self.sink.write(chunk)
+        return chunk
+
+
+# ===== ijson backend =====
+def _iter_ijson(stream, array_key, meta):
+    item_prefix = f"{array_key}.item" if array_key else "item"
+    builder = None
+    target = None
+
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == target and event in ("end_map", "end_array"):
+                if target == item_prefix:
+                    yield builder.value
+                else:
+                    meta[target] = builder.value
+                builder = None
+            continue
+
+        is_item = prefix == item_prefix
+        is_meta = array_key and prefix and "." not in prefix and prefix != array_key
+        if not (is_item or is_meta):
+            continue
+
+        if event in ("start_map", "start_array"):
+            builder = ObjectBuilder()
+            builder.event(event, value)
+            target = prefix
+        elif event not in ("map_key", "end_map", "end_array"):
+            if is_item:
+                yield value
+            else:
+                meta[prefix] = value
+
+
+# ===== raw_decode reader =====
+class _Reader:
+    """Incrementally decodes JSON values from a growing text buffer."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            text = self.text_decoder.decode(b"", final=True) if not isinstance(chunk, str) else ""
+        elif isinstance(chunk, str):
+            text = chunk
+        else:
+            text = self.text_decoder.decode(chunk)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character, or "" at end of input."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            # A number running up to the buffer end, even if only its "9." or "1e"
+            # prefix decoded, may continue in the next chunk
+            if (not self.eof and isinstance(value, (int, float))
+                    and _NUMBER_TAIL.match(self.buf, end).end() == len(self.buf)):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+    def key(self):
+        """Read an object key and the colon after it."""
+        match = _KEY.match(self.buf, self.pos)
+        if match and match.end() < len(self.buf):
+            self.pos = match.end()
+            return match.group(1)
+        key = self.value()      # escaped key or buffer boundary: take the slow path
+        self.expect(":")
+        return key
+
+    def skip(self):
+        """Move past the next value without decoding it."""
+        char = self.peek()
+        if char == '"':
+            match = _STRING.match(self.buf, self.pos)
+            if match and match.end() < len(self.buf):
+                self.pos = match.end()
+                return
+        if char not in ("{", "["):
+            self.value()
+            return
+        self.skip_to_close(0)
+
+    def skip_to_close(self, depth):
+        """Scan past brackets until depth nested containers are closed again."""
+        pos = self.pos
+        while True:
+            # Jump over everything up to the next bracket outside a string in one match
+            pos = _SKIP_RUN.match(self.buf, pos).end()
+            char = self.buf[pos:pos + 1]
+            if char == "" or char == '"':
+                # The value continues past the buffer; keep the offset across the refill
+                if self.eof:
+                    raise ValueError(f"unterminated value at offset {self.pos}")
+                offset = pos - self.pos
+                self.fill()
+                pos = offset
+                continue
+            if char in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    self.pos = pos + 1
+                    return
+            pos += 1
+
+    def projected(self, projection):
+        """Decode the next value keeping only the projected parts (see project())."""
+        char = self.peek()
+        if isinstance(projection, list):
+            if char != "[":
+                return self.projected(projection[0])
+            self.pos += 1
+            if self.peek() == "]":
+                self.pos += 1
+                return []
+            first = self.projected(projection[0])
+            self.skip_to_close(1)
+            return [first]
+        if char == "[":
+            return list(_iter_array(self, projection))
+        if char != "{":
+            return self.value()
+
+        self.pos += 1
+        obj = {}
+        if self.peek() == "}":
+            self.pos += 1
+            return obj
+        while True:
+            key = self.key()
+            sub = projection.get(key)
+            if sub is None:
+                self.skip()
+            elif sub is True:
+                obj[key] = self.value()
+            else:
+                obj[key] = self.projected(sub)
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return obj
+
+
+def _iter_array(reader, projection=None):
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.projected(projection) if projection else reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("]")
+        return
+
+
+def _iter_raw_decode(stream, array_key, meta, projection=None):
+    reader = _Reader(stream)
+    if array_key is None:
+        yield from _iter_array(reader, projection)
+        return
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == array_key:
+            yield from _iter_array(reader, projection)
+        else:
+            meta[key] = reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
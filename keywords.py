@@ -0,0 +1,61 @@
+import re
+
+
+# ===== Pattern building =====
+def _trie_pattern(words):
+    """
+    Regex source matching any of words with shared prefixes factored out, e.g.
+    ["legal basement", "legal second unit"] -> "legal\\ (?:basement|second\\ unit)",
+    so each text position is tried against one branch per next character rather
+    than once per keyword.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}           # a keyword ends here
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A keyword ends here but a longer one continues: greedy ? keeps the longest
+        pattern = f"(?:{pattern})?"
+    return pattern
+
+
+# ===== Matcher =====
+class KeywordMatcher:
+    """
+    A keyword list compiled into one case-insensitive regex, so a text is scanned
+    once whatever the number of keywords. Matches are leftmost-longest and
+    non-overlapping, like a single Aho-Corasick pass.
+
+        LEGAL_BASEMENT = KeywordMatcher(["legal basement", "second dwelling"])
+        LEGAL_BASEMENT.search(remarks)        # True / False
+        LEGAL_BASEMENT.spans(remarks)         # [(start, end, "legal basement"), ...]
+        LEGAL_BASEMENT.highlight(remarks)     # "... *Legal Basement* ..."
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(keywords)
+        words = {keyword.lower() for keyword in self.keywords if keyword}
+        # (?!) never matches, for an empty keyword list
+        self.pattern = re.compile(_trie_pattern(words) if words else "(?!)", re.IGNORECASE)
+
+    def search(self, text):
+        """True when text contains any keyword."""
+        return self.pattern.search(text) is not None
+
+    def spans(self, text):
+        """(start, end, keyword) of every keyword occurrence in text, in order."""
+        return [(match.start(), match.end(), match.group().lower()) for match in self.pattern.finditer(text)]
+
+    def highlight(self, text, marker="*"):
+        """text with every keyword occurrence wrapped in marker (WhatsApp bold by default)."""
+        return self.pattern.sub(lambda match: f"{marker}{match.group()}{marker}", text)
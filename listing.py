@@ -0,0 +1,205 @@
+import re
+import sys
+
+
+# ===== Field parsing =====
+def to_int(value, default=0):
+    """int() of a numeric string such as "3", or default when missing/unparseable."""
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+def to_money(value):
+    """Parse "$5,432", "969800" or a number into a float; 0.0 when missing."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value or "").replace("$", "").replace(",", "").strip() or 0)
+    except ValueError:
+        return 0.0
+
+
+def parse_bedrooms(bedroom_str):
+    """Convert a '3 + 2' style string into total integer bedrooms."""
+    if not bedroom_str:
+        return 0
+    parts = bedroom_str.replace(" ", "").split("+")
+    return sum(int(p) for p in parts if p.isdigit())
+
+
+def parse_address(address_text):
+    """
+    Split an AddressText like "415 CHATHAM Street|Brantford, Ontario N3S4J4"
+    into (area, province): ("Brantford", "Ontario"). Missing parts are "".
+    """
+    if "|" not in address_text:
+        return "", ""
+    second_part = address_text.split("|")[1]
+    area = second_part.split(",")[0].strip()
+    province = ""
+    if "," in second_part:
+        words = second_part.split(",")[1].split()
+        province = words[0].strip() if words else ""
+    return area, province
+
+
+SQFT_PER_M2 = 10.7639
+
+
+def parse_area(area_text):
+    """
+    Interior size in sqft from "139.3534 m2", "1500 sqft", "1500+ sqft" or a
+    "1500-2000 sqft" range (its midpoint); 0.0 when missing.
+    """
+    numbers = [float(n) for n in re.findall(r"(?<![A-Za-z])\d+(?:\.\d+)?", area_text.replace(",", ""))[:2]]
+    if not numbers:
+        return 0.0
+    area = sum(numbers) / len(numbers)
+    unit = area_text.lower()
+    if "m2" in unit or "m²" in unit or "sqm" in unit:
+        area *= SQFT_PER_M2
+    return area
+
+
+def _text(value):
+    return value if isinstance(value, str) else ""
+
+
+# ===== Raw fields read =====
+# Every raw key Listing.from_raw (plus dedup and delta) reads, as a json_stream
+# projection: anything else (Individual, Room, Photo resolutions, History ...) is
+# skipped while decoding. Add a key here before reading it in from_raw.
+RAW_FIELDS = {
+    "Id": True,
+    "MlsNumber": True,
+    "HashCode": True,
+    "LastUpdated": True,
+    "PublicRemarks": True,
+    "RelativeURLEn": True,
+    "Building": {
+        "Type": True,
+        "Bedrooms": True,
+        "BedroomsAboveGround": True,
+        "BedroomsBelowGround": True,
+        "BathroomTotal": True,
+        "DisplayAsYears": True,
+        "UnitTotal": True,
+        "TotalUnits": True,
+        "BasementFeatures": True,
+        "SizeInterior": True,
+        "FloorAreaMeasurements": [{"Area": True, "AreaUnformatted": True}],
+    },
+    "Property": {
+        "Price": True,
+        "PriceUnformattedValue": True,
+        "TaxAmount": True,
+        "AmmenitiesNearBy": True,
+        "ParkingSpaceTotal": True,
+        "Photo": [{"HighResPath": True}],      # first photo only
+        "Address": {
+            "AddressText": True,
+            "City": True,
+            "Municipality": True,
+            "Province": True,
+            "LocalLogicNeighbourHood": True,
+            "Subdivision": True,
+            "Latitude": True,
+            "Longitude": True,
+        },
+    },
+    "Land": {"SizeTotal": True},
+}
+
+
+# ===== Normalised listing =====
+_INTERNED = {"building_type", "area", "city", "province", "neighbourhood"}
+
+
+class Listing:
+    """
+    The fields of one PropertySearch_Post / Apify result that the scripts use,
+    parsed once into typed values. Built with Listing.from_raw(raw) as results
+    come in, after which the raw nested dict can be dropped. city falls back to
+    the town parsed from AddressText unless from_raw gets address_city=False.
+    """
+
+    __slots__ = (
+        "id", "mls_number", "hash_code", "last_updated", "remarks",
+        "building_type", "bedrooms_text", "bedrooms", "bedrooms_above", "bedrooms_below",
+        "bathrooms", "parking", "age", "units", "sqft", "basement_features",
+        "price", "price_text", "tax_amount", "amenities", "lot_size",
+        "address_text", "area", "city", "province", "neighbourhood",
+        "latitude", "longitude", "photo_url", "relative_url",
+    )
+
+    @classmethod
+    def from_raw(cls, raw, address_city=True):
+        building = raw.get("Building") or {}
+        property_info = raw.get("Property") or {}
+        address_info = property_info.get("Address") or {}
+        land = raw.get("Land") or {}
+        photos = property_info.get("Photo") or [{}]
+
+        listing = cls.__new__(cls)
+        listing.id = _text(raw.get("Id"))
+        listing.mls_number = _text(raw.get("MlsNumber"))
+        listing.hash_code = _text(raw.get("HashCode"))
+        listing.last_updated = _text(raw.get("LastUpdated"))
+        listing.remarks = _text(raw.get("PublicRemarks"))
+
+        listing.building_type = sys.intern(_text(building.get("Type")).strip())
+        listing.bedrooms_text = _text(building.get("Bedrooms"))
+        listing.bedrooms = parse_bedrooms(listing.bedrooms_text)
+        listing.bedrooms_above = to_int(building.get("BedroomsAboveGround"))
+        listing.bedrooms_below = to_int(building.get("BedroomsBelowGround"))
+        listing.bathrooms = to_int(building.get("BathroomTotal"))
+        listing.parking = to_int(property_info.get("ParkingSpaceTotal"))
+        age = _text(building.get("DisplayAsYears"))
+        listing.age = int(age) if age.isdigit() else None
+        listing.units = to_int(building.get("UnitTotal") or building.get("TotalUnits"))
+        listing.basement_features = _text(building.get("BasementFeatures"))
+        # SizeInterior when given, else the first FloorAreaMeasurements entry (often a range)
+        floor_area = (building.get("FloorAreaMeasurements") or [{}])[0]
+        listing.sqft = (parse_area(_text(building.get("SizeInterior")))
+                        or parse_area(_text(floor_area.get("AreaUnformatted") or floor_area.get("Area"))))
+
+        listing.price_text = _text(property_info.get("Price"))
+        listing.price = to_money(property_info.get("PriceUnformattedValue")) or to_money(listing.price_text)
+        listing.tax_amount = to_money(property_info.get("TaxAmount"))
+        listing.amenities = _text(property_info.get("AmmenitiesNearBy"))
+        listing.lot_size = _text(land.get("SizeTotal"))
+
+        listing.address_text = _text(address_info.get("AddressText"))
+        area, province = parse_address(listing.address_text)
+        listing.area = sys.intern(area)
+        # address_city=False keeps city empty when neither City nor Municipality is given
+        listing.city = sys.intern(_text(address_info.get("City") or address_info.get("Municipality"))
+                                  or (area if address_city else ""))
+        listing.province = sys.intern(province or _text(address_info.get("Province")))
+        listing.neighbourhood = sys.intern(_text(
+            address_info.get("LocalLogicNeighbourHood") or address_info.get("Subdivision")))
+        listing.latitude = to_money(address_info.get("Latitude"))
+        listing.longitude = to_money(address_info.get("Longitude"))
+
+        listing.photo_url = _text(photos[0].get("HighResPath"))
+        listing.relative_url = _text(raw.get("RelativeURLEn"))
+        return listing
+
+    @classmethod
+    def from_values(cls, values):
+        """Rebuild a Listing from values() (e.g. a listing_store row)."""
+        listing = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            if name in _INTERNED and value is not None:
+                value = sys.intern(value)
+            setattr(listing, name, value)
+        return listing
+
+    def values(self):
+        """Field values in __slots__ order."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"Listing({self.mls_number or self.id}, {self.city or '?'}, ${self.price:,.0f})"
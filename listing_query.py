@@ -0,0 +1,178 @@
+"""
+Listing filters written as one clause per line and compiled into a predicate
+pipeline over a listing_table.ListingTable:
+
+    QUERY = ListingQuery('''
+        bedrooms_above + bedrooms_below >= 3
+        parking >= 2
+        age <= 35 or missing          # a missing age passes
+        lot_size is set
+        building_type in (duplex, triplex, 4plex)
+        remarks + basement_features matches LEGAL_BASEMENT
+    ''', matchers={"LEGAL_BASEMENT": LEGAL_BASEMENT})
+
+    for listing in QUERY.rows(ListingTable(listings)): ...
+
+Numeric clauses run first as NumPy masks, narrowing the batch before any
+string work; the string clauses then run per surviving listing. Within each
+stage clauses are reordered after every batch by how many listings they
+rejected, weighted by their cost, so the cheapest rejection comes first.
+"""
+import re
+
+import numpy as np
+
+from listing_table import COLUMNS, ListingTable
+
+# ===== CONFIG =====
+# Relative cost of one per-listing check, for ordering the string clauses
+COSTS = {"set": 1, "in": 2, "matches": 20}
+
+_OPERATORS = {
+    ">=": np.greater_equal, "<=": np.less_equal, ">": np.greater,
+    "<": np.less, "==": np.equal, "!=": np.not_equal,
+}
+_FIELDS = r"\w+(?:\s*\+\s*\w+)*"
+_NUMERIC = re.compile(rf"(?P<fields>{_FIELDS})\s*(?P<op>>=|<=|==|!=|>|<)\s*(?P<value>-?\d+(?:\.\d+)?)"
+                      rf"(?P<missing>\s+or\s+missing)?")
+_SET = re.compile(r"(?P<field>\w+)\s+is\s+set")
+_IN = re.compile(r"(?P<field>\w+)\s+in\s*\((?P<values>[^)]*)\)")
+_MATCHES = re.compile(rf"(?P<fields>{_FIELDS})\s+matches\s+(?P<matcher>\w+)")
+
+
+def _fields(text):
+    return [name.strip() for name in text.split("+")]
+
+
+def _normalise(value):
+    """For "in": case-insensitive and ignoring spaces and hyphens ("Four-Plex" == "fourplex")."""
+    return value.lower().replace("-", "").replace(" ", "")
+
+
+# ===== Clauses =====
+class _Clause:
+    def __init__(self, text, kind, test):
+        self.text = text
+        self.kind = kind
+        self.test = test
+        self.seen = 0
+        self.passed = 0
+
+    def record(self, seen, passed):
+        self.seen += seen
+        self.passed += passed
+
+    def rank(self):
+        """Expected cost per rejected listing; unseen clauses count as rejecting half."""
+        pass_rate = self.passed / self.seen if self.seen else 0.5
+        return COSTS.get(self.kind, 1) / max(1.0 - pass_rate, 1e-6)
+
+
+def _numeric_clause(text, match):
+    fields = _fields(match["fields"])
+    for name in fields:
+        if name not in COLUMNS:
+            raise ValueError(f"{name!r} is not a numeric listing column in {text!r}")
+    compare = _OPERATORS[match["op"]]
+    value = float(match["value"])
+    keep_missing = bool(match["missing"])
+
+    def test(table, rows):
+        values = sum(table[name][rows] for name in fields)
+        mask = compare(values, value)
+        if keep_missing:
+            mask |= np.isnan(values)
+        return mask
+    return _Clause(text, "numeric", test)
+
+
+def _text_clause(text, matchers):
+    match = _SET.fullmatch(text)
+    if match:
+        field = match["field"]
+        return _Clause(text, "set", lambda listing: bool(getattr(listing, field)))
+
+    match = _IN.fullmatch(text)
+    if match:
+        field = match["field"]
+        values = frozenset(_normalise(value) for value in match["values"].split(",") if value.strip())
+        return _Clause(text, "in", lambda listing: _normalise(getattr(listing, field) or "") in values)
+
+    match = _MATCHES.fullmatch(text)
+    if match:
+        fields = _fields(match["fields"])
+        matcher = (matchers or {}).get(match["matcher"])
+        if matcher is None:
+            raise ValueError(f"no matcher named {match['matcher']!r} for {text!r}")
+        if len(fields) == 1:
+            field = fields[0]
+            return _Clause(text, "matches", lambda listing: matcher.search(getattr(listing, field) or ""))
+        return _Clause(text, "matches", lambda listing: matcher.search(
+            " ".join(getattr(listing, name) or "" for name in fields)))
+    return None
+
+
+# ===== Query =====
+class ListingQuery:
+    """A compiled filter; see the module docstring for the clause syntax."""
+
+    def __init__(self, text, matchers=None):
+        self.text = text
+        self.numeric = []
+        self.per_listing = []
+        for line in text.splitlines():
+            clause = line.split("#", 1)[0].strip()
+            if not clause:
+                continue
+            match = _NUMERIC.fullmatch(clause)
+            if match:
+                self.numeric.append(_numeric_clause(clause, match))
+                continue
+            compiled = _text_clause(clause, matchers)
+            if compiled is None:
+                raise ValueError(f"unrecognised filter clause {clause!r}")
+            self.per_listing.append(compiled)
+
+    def indices(self, table):
+        """Positions in table (a ListingTable) of the listings passing every clause."""
+        rows = np.arange(len(table))
+        for clause in sorted(self.numeric, key=_Clause.rank):
+            if not len(rows):
+                break
+            mask = clause.test(table, rows)
+            clause.record(len(rows), int(mask.sum()))
+            rows = rows[mask]
+
+        clauses = sorted(self.per_listing, key=_Clause.rank)
+        seen = [0] * len(clauses)
+        passed = [0] * len(clauses)
+        kept = []
+        for i in rows.tolist():
+            listing = table.listings[i]
+            for n, clause in enumerate(clauses):
+                seen[n] += 1
+                if not clause.test(listing):
+                    break
+                passed[n] += 1
+            else:
+                kept.append(i)
+        for clause, clause_seen, clause_passed in zip(clauses, seen, passed):
+            clause.record(clause_seen, clause_passed)
+        return kept
+
+    def rows(self, table):
+        """The listings of table passing every clause, in batch order."""
+        return [table.listings[i] for i in self.indices(table)]
+
+    def matches(self, listing):
+        """Whether one listing.Listing passes every clause."""
+        if self.numeric:
+            return bool(self.indices(ListingTable([listing])))
+        return all(clause.test(listing) for clause in self.per_listing)
+
+    def report(self):
+        """Each clause with how many listings it saw and rejected, in current evaluation order."""
+        for clause in sorted(self.numeric, key=_Clause.rank) + sorted(self.per_listing, key=_Clause.rank):
+            rejected = clause.seen - clause.passed
+            share = rejected / clause.seen if clause.seen else 0.0
+            print(f"🔎 {clause.text}: rejected {rejected} of {clause.seen} ({share:.0%})")
@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import delta
+from listing import Listing
+
+# ===== CONFIG =====
+STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "listings.sqlite3")
+BATCH_SIZE = 1000          # rows per executemany upsert
+FULL_RUN_DAYS = 7          # --incremental refetches everything once the last full fetch is this old
+
+FIELDS = Listing.__slots__
+# Extra columns kept next to the Listing fields
+META_FIELDS = ("source", "updated_at", "first_seen", "last_seen")
+
+# Listing fields keep the Python types they were parsed into (no declared affinity).
+# Rows are keyed on Id per source, so scripts covering the same market keep their own rows.
+_COLUMN_DEFS = ",\n    ".join(
+    ["id TEXT NOT NULL"] + [name for name in FIELDS if name != "id"]
+    + ["source TEXT NOT NULL", "updated_at TEXT", "first_seen REAL", "last_seen REAL",
+       "PRIMARY KEY (source, id)"])
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS listings (
+    {_COLUMN_DEFS}
+);
+CREATE INDEX IF NOT EXISTS listings_city ON listings (city);
+CREATE INDEX IF NOT EXISTS listings_price ON listings (price);
+CREATE INDEX IF NOT EXISTS listings_updated_at ON listings (updated_at);
+CREATE INDEX IF NOT EXISTS listings_mls_number ON listings (mls_number);
+
+-- Full (non-incremental) fetches per source; rows not seen since the latest are off the market
+CREATE TABLE IF NOT EXISTS runs (
+    source TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (source, started_at)
+);
+"""
+
+_COLUMNS = FIELDS + META_FIELDS
+UPSERT = (
+    f"INSERT INTO listings ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)}) "
+    f"ON CONFLICT(source, id) DO UPDATE SET "
+    + ", ".join(f"{name} = excluded.{name}" for name in _COLUMNS
+                if name not in ("id", "source", "first_seen"))
+)
+
+
+# ===== Connection =====
+def connect(path=None):
+    """Open (and create if needed) the listing store in WAL mode."""
+    path = path or STORE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    # Listing fields added after a store was created become new (NULL) columns
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(listings)")}
+    for name in FIELDS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE listings ADD COLUMN {name}")
+    return conn
+
+
+# ===== Writes =====
+def _row(listing, source, now):
+    updated = delta.parse_last_updated(listing.last_updated)
+    # LastUpdated is stored as ISO text too so it sorts and range-queries correctly
+    return listing.values() + (source, updated.isoformat() if updated else None, now, now)
+
+
+def save_listings(listings, source, path=None):
+    """
+    Upsert listing.Listing objects keyed on (source, Id), in batches of BATCH_SIZE.
+    source names the script that fetched them. Returns rows written.
+    """
+    now = time.time()
+    written = 0
+    with closing(connect(path)) as conn:
+        batch = []
+        for listing in listings:
+            if not listing.id:
+                continue
+            batch.append(_row(listing, source, now))
+            if len(batch) >= BATCH_SIZE:
+                with conn:
+                    conn.executemany(UPSERT, batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            with conn:
+                conn.executemany(UPSERT, batch)
+            written += len(batch)
+    return written
+
+
+def record_run(source, started_at, path=None):
+    """
+    Mark a complete fetch of source that began at started_at (a time.time()),
+    after its listings were saved. Only full fetches count: an incremental one
+    does not see the unchanged listings that are still for sale.
+    """
+    with closing(connect(path)) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO runs (source, started_at) VALUES (?, ?)", (source, started_at))
+
+
+def needs_full_run(source, max_age_days=FULL_RUN_DAYS, path=None):
+    """
+    True when source has no recorded full fetch younger than max_age_days.
+    Incremental runs never see a listing leave the market, so until a full
+    fetch refreshes last_seen, delisted and sold rows still count as live.
+    """
+    with closing(connect(path)) as conn:
+        started_at = conn.execute("SELECT MAX(started_at) FROM runs WHERE source = ?", (source,)).fetchone()[0]
+    return started_at is None or time.time() - started_at > max_age_days * 24 * 3600
+
+
+# ===== Reads =====
+def _last_full_run(conn, source):
+    started_at = conn.execute("SELECT MAX(started_at) FROM runs WHERE source = ?", (source,)).fetchone()[0]
+    if started_at is None:
+        # Stores written before runs were recorded: every save was a full fetch
+        started_at = conn.execute("SELECT MAX(last_seen) FROM listings WHERE source = ?", (source,)).fetchone()[0]
+    return started_at
+
+
+def last_full_run(source, path=None):
+    """time.time() at which the latest full fetch of source began, or None when nothing is stored."""
+    with closing(connect(path)) as conn:
+        return _last_full_run(conn, source)
+
+
+def load_listings(source=None, where=None, params=(), order_by=None, limit=None, live=True, path=None):
+    """
+    Return stored listings as listing.Listing objects, optionally restricted to
+    one source and an extra SQL condition over the columns, e.g.
+        load_listings("halton", "city = ? AND price <= ?", ("Milton", 1_000_000), "price")
+    With a source and live, only listings seen since its latest full fetch are
+    returned: rows a full run no longer brought back are sold or delisted.
+    """
+    with closing(connect(path)) as conn:
+        conditions, args = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            args.append(source)
+            cutoff = _last_full_run(conn, source) if live else None
+            if cutoff is not None:
+                conditions.append("last_seen >= ?")
+                args.append(cutoff)
+        if where:
+            conditions.append(f"({where})")
+            args.extend(params)
+
+        sql = f"SELECT {', '.join(FIELDS)} FROM listings"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [Listing.from_values(row) for row in conn.execute(sql, args)]
+
+
+def query(sql, params=(), path=None):
+    """Run a read-only SQL query against the store and return its rows as dicts."""
+    with closing(connect(path)) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(sql, params)]
@@ -0,0 +1,60 @@
+from operator import attrgetter
+
+import numpy as np
+
+# ===== CONFIG =====
+# Listing attribute -> column dtype; age and sqft are float so a missing value can be NaN
+COLUMNS = {
+    "bedrooms": np.int16,
+    "bedrooms_above": np.int16,
+    "bedrooms_below": np.int16,
+    "bathrooms": np.int16,
+    "parking": np.int16,
+    "units": np.int16,
+    "age": np.float32,
+    "sqft": np.float64,
+    "price": np.float64,
+    "tax_amount": np.float64,
+}
+
+
+# ===== Columnar batch =====
+class ListingTable:
+    """
+    A batch of listing.Listing objects with their numeric fields held as NumPy
+    columns, so threshold predicates (bedrooms >= 3, age <= 35 ...) run as one
+    boolean mask over the whole batch and only surviving rows are touched in Python.
+
+        table = ListingTable(listings)
+        mask = (table["bathrooms"] >= 2) & (table.column("age", missing=0) <= 35)
+        for listing in table.rows(mask): ...
+    """
+
+    def __init__(self, listings):
+        self.listings = listings if isinstance(listings, list) else list(listings)
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            values = map(attrgetter(name), self.listings)
+            if np.issubdtype(dtype, np.floating):
+                values = (np.nan if value is None else value for value in values)
+            self.columns[name] = np.fromiter(values, dtype=dtype, count=len(self.listings))
+
+    def __len__(self):
+        return len(self.listings)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def column(self, name, missing=None):
+        """A column with NaN (missing) values replaced by missing when given."""
+        values = self.columns[name]
+        if missing is None:
+            return values
+        return np.where(np.isnan(values), missing, values)
+
+    def indices(self, mask):
+        return np.flatnonzero(mask)
+
+    def rows(self, mask):
+        """The listings where mask is True, in batch order."""
+        return [self.listings[i] for i in np.flatnonzero(mask)]
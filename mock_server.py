@@ -0,0 +1,338 @@
+"""
+Local stand-in for api2.realtor.ca PropertySearch_Post and the Apify dataset
+items endpoints, serving synthetic listings shaped like Realtor-JsonObj.json.
+
+    python mock_server.py --port 8099 --listings 20000 --latency 80 --error-rate 0.02 --rate 20
+    MOCK_SERVER_URL=http://127.0.0.1:8099 python api-scraper-residential-halton.py
+    python mock_server.py --port 8099 --check-reuse     # pages share one keep-alive connection
+
+With MOCK_SERVER_URL set, http_client sends realtor.ca and apify.com requests here.
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ===== CONFIG =====
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Realtor-JsonObj.json")
+MAX_RECORDS = 600          # PropertySearch_Post never returns more than this per search
+
+# (city, latitude, longitude) centres the synthetic listings are scattered around
+CITIES = [
+    ("Milton", 43.5183, -79.8774),
+    ("Oakville", 43.4675, -79.6877),
+    ("Burlington", 43.3255, -79.7990),
+    ("Brampton", 43.7315, -79.7624),
+    ("Mississauga", 43.5890, -79.6441),
+    ("Caledon", 43.8668, -79.8580),
+    ("London", 42.9849, -81.2453),
+    ("Kitchener", 43.4516, -80.4925),
+    ("Brantford", 43.1394, -80.2644),
+]
+
+BUILDING_TYPES = ["House", "House", "House", "Duplex", "Triplex", "Fourplex"]
+
+REMARKS = [
+    "Beautiful detached home with a legal basement apartment and separate entrance.",
+    "Income property! Registered second dwelling unit, great for investment.",
+    "Welcome to this renovated family home close to schools and transit.",
+    "Legal triplex with long-term tenants in place, strong rental income.",
+    "Spacious semi with finished basement, in-law suite potential.",
+    "Turnkey duplex, separately metered units, ideal for investors.",
+]
+
+
+# ===== Synthetic listings =====
+def build_index(count, seed):
+    """Lightweight per-listing attributes; full listings are rendered on demand."""
+    rng = random.Random(seed)
+    now = datetime(2025, 10, 1, 12, 0, 0)
+    index = []
+    for i in range(count):
+        city, lat, lon = rng.choice(CITIES)
+        building_type = rng.choice(BUILDING_TYPES)
+        price = rng.randrange(550_000, 1_300_000, 100)
+        above = rng.randint(2, 5)
+        index.append({
+            "id": str(30_000_000 + i),
+            "mls": f"W{12_000_000 + i}",
+            "hash": str(rng.getrandbits(31)),
+            # Listings are generated newest first, matching Sort=6-D
+            "updated": now - timedelta(minutes=17 * i),
+            "city": city,
+            "lat": lat + rng.gauss(0, 0.04),
+            "lon": lon + rng.gauss(0, 0.06),
+            "price": price,
+            "tax": round(price * rng.uniform(0.005, 0.009)),
+            "type": building_type,
+            "units": {"Duplex": 2, "Triplex": 3, "Fourplex": 4}.get(building_type, 1),
+            "beds": (above, rng.randint(0, 2)),
+            "baths": rng.randint(1, 4),
+            "parking": rng.randint(1, 6),
+            "age": rng.randint(0, 60),
+            "remarks": rng.choice(REMARKS),
+            "sqft": rng.randrange(900, 3500, 50),
+        })
+    return index
+
+
+def render(template, entry):
+    """Full listing JSON object for one index entry, shaped like the fixture."""
+    listing = dict(template)
+    building = copy.deepcopy(template.get("Building", {}))
+    prop = copy.deepcopy(template.get("Property", {}))
+    address = prop.setdefault("Address", {})
+
+    above, below = entry["beds"]
+    updated = entry["updated"].strftime("%Y-%m-%d %I:%M:%S %p").replace(" 0", " ")
+    listing.update({
+        "Id": entry["id"],
+        "MlsNumber": entry["mls"],
+        "HashCode": entry["hash"],
+        "LastUpdated": updated,
+        "PublicRemarks": entry["remarks"],
+        "RelativeURLEn": f"/real-estate/{entry['id']}/mock-listing",
+        "Building": building,
+        "Property": prop,
+    })
+    building.update({
+        "Type": entry["type"],
+        "Bedrooms": f"{above} + {below}" if below else str(above),
+        "BedroomsAboveGround": str(above),
+        "BedroomsBelowGround": str(below),
+        "BathroomTotal": str(entry["baths"]),
+        "DisplayAsYears": str(entry["age"]),
+        "SizeInterior": f"{entry['sqft'] * 0.092903:.4f} m2",
+        "FloorAreaMeasurements": [{"Area": f"{entry['sqft']} sqft", "Type": "Square Footage"}],
+    })
+    if entry["units"] > 1:
+        building["UnitTotal"] = str(entry["units"])
+    prop.update({
+        "Price": f"${entry['price']:,}",
+        "PriceUnformattedValue": str(entry["price"]),
+        "TaxAmount": f"${entry['tax']:,}",
+        "ParkingSpaceTotal": str(entry["parking"]),
+    })
+    address.update({
+        "AddressText": f"{int(entry['id']) % 900 + 1} MOCK STREET|{entry['city']}, Ontario",
+        "Latitude": f"{entry['lat']:.7f}",
+        "Longitude": f"{entry['lon']:.7f}",
+        "City": entry["city"],
+    })
+    return listing
+
+
+def matches(entry, form):
+    """Apply the bbox and price filters of a PropertySearch_Post form."""
+    def number(key, default):
+        try:
+            return float(form.get(key, default))
+        except ValueError:
+            return default
+
+    return (
+        number("LatitudeMin", -90) <= entry["lat"] <= number("LatitudeMax", 90)
+        and number("LongitudeMin", -180) <= entry["lon"] <= number("LongitudeMax", 180)
+        and number("PriceMin", 0) <= entry["price"] <= number("PriceMax", math.inf)
+    )
+
+
+# ===== Fault injection =====
+class Faults:
+    """Latency, random errors and a token-bucket throttle applied to every request."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, rate=0, seed=0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def throttled(self):
+        if not self.rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return True
+            self.tokens -= 1
+            return False
+
+    def failed(self):
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def delay(self):
+        with self.lock:
+            extra = self.rng.uniform(0, self.jitter) if self.jitter else 0
+        time.sleep(self.latency + extra)
+
+
+# ===== HTTP handler =====
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     # keep-alive, so client connection reuse is realistic
+    index = []
+    template = {}
+    faults = Faults()
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, obj, extra_headers=None):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject_faults(self):
+        """Returns True when a fault response was sent instead of the real one."""
+        self.faults.delay()
+        if self.faults.throttled():
+            self.send_json(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+            return True
+        if self.faults.failed():
+            self.send_json(503, {"error": "Service Unavailable"})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        if not urlsplit(self.path).path.endswith("PropertySearch_Post"):
+            self.send_json(404, {"error": "Not Found"})
+            return
+        if self.inject_faults():
+            return
+
+        hits = [entry for entry in self.index if matches(entry, form)]
+        total = len(hits)
+        hits = hits[:MAX_RECORDS]
+        per_page = max(1, int(form.get("RecordsPerPage", 10)))
+        page = max(1, int(form.get("CurrentPage", 1)))
+        rows = hits[(page - 1) * per_page:page * per_page]
+
+        self.send_json(200, {
+            "ErrorCode": {"Id": 200, "Description": "Success - OK"},
+            "Paging": {
+                "RecordsPerPage": per_page,
+                "CurrentPage": page,
+                "TotalRecords": total,
+                "MaxRecords": MAX_RECORDS,
+                "TotalPages": max(1, math.ceil(len(hits) / per_page)),
+                "RecordsShowing": len(rows),
+            },
+            "Results": [render(self.template, entry) for entry in rows],
+            "Pins": [],
+        })
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if not parts.path.endswith("/items"):
+            self.send_json(404, {"error": "Not Found"})
+            return
+        if self.inject_faults():
+            return
+
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        offset = max(0, int(query.get("offset", 0)))
+        limit = int(query.get("limit", len(self.index)))
+        rows = self.index[offset:offset + limit]
+        self.send_json(200, [render(self.template, entry) for entry in rows], {
+            "X-Apify-Pagination-Offset": str(offset),
+            "X-Apify-Pagination-Limit": str(limit),
+            "X-Apify-Pagination-Count": str(len(rows)),
+            "X-Apify-Pagination-Total": str(len(self.index)),
+        })
+
+
+def make_server(port=8099, listings=5000, seed=42, latency_ms=0, jitter_ms=0, error_rate=0.0, rate=0):
+    """Build (but do not start) a mock server; handy for benchmarks in a background thread."""
+    with open(FIXTURE_FILE, encoding="utf-8") as f:
+        template = json.load(f)
+
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "index": build_index(listings, seed),
+        "template": template,
+        "faults": Faults(latency_ms, jitter_ms, error_rate, rate, seed),
+    })
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def check_reuse(port=8099, pages=5, listings=2000):
+    """
+    Fetch pages one after another through fetcher.fetch_page, on the HTTP/2 (httpx)
+    path when available and on the requests path, and check that they share one
+    keep-alive connection. Returns True when every path reused its connection.
+    """
+    import importlib
+    import tempfile
+    import threading
+
+    import fetcher
+    import http_client
+    import response_cache
+
+    server = make_server(port, listings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "https://api2.realtor.ca/Listing.svc/PropertySearch_Post"
+    payload = {"RecordsPerPage": "100"}
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            response_cache.CACHE_DIR = cache_dir    # every page must come off the network
+            for use_http2 in (True, False):
+                importlib.reload(http_client)       # fresh pools and counters
+                http_client.MOCK_SERVER_URL = f"http://127.0.0.1:{port}"
+                http_client.USE_HTTP2 = use_http2
+                for page in range(1, pages + 1):
+                    fetcher.fetch_page(url, dict(payload, Sort=str(use_http2)), page, market="reuse-check")
+                stats = http_client.connection_stats()
+                connections = sum(entry["connections"] for entry in stats.values())
+                path = "httpx" if http_client.get_http2_client("api2.realtor.ca") else "requests"
+                reused = connections == 1
+                ok = ok and reused
+                print(f"{'✅' if reused else '❌'} {path}: {pages} pages over {connections} connection(s)")
+    finally:
+        server.shutdown()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local PropertySearch_Post / Apify stand-in")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--listings", type=int, default=5000, help="synthetic listings to serve")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0, help="added latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra latency up to this (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--rate", type=float, default=0, help="requests/second before answering 429 (0 = off)")
+    parser.add_argument("--check-reuse", action="store_true",
+                        help="fetch a few pages through fetcher and check they reuse one connection, then exit")
+    args = parser.parse_args()
+
+    if args.check_reuse:
+        raise SystemExit(0 if check_reuse(args.port) else 1)
+
+    server = make_server(args.port, args.listings, args.seed, args.latency, args.jitter,
+                         args.error_rate, args.rate)
+    print(f"🧪 Mock server on http://127.0.0.1:{args.port} with {args.listings} listings")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
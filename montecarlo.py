@@ -0,0 +1,109 @@
+"""
+Monte Carlo cashflow risk per listing: mortgage rate paths, vacancy, rent and
+expense draws instead of the single point estimate in the posts.
+
+    python scrapper-milton --from-store --montecarlo
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import finance
+
+# ===== CONFIG =====
+DRAWS = 10_000             # simulated outcomes per listing
+HORIZON_YEARS = 5          # rate path length; the payment resets every year
+RATE_VOLATILITY = 0.0075   # yearly standard deviation of rate moves
+RATE_FLOOR = 0.005
+RENT_VOLATILITY = 0.08     # lognormal sigma on achieved rent
+VACANCY_MEAN = 0.04        # share of the year vacant, Beta distributed
+VACANCY_CONCENTRATION = 25
+EXPENSE_VOLATILITY = 0.20  # lognormal sigma on non-mortgage costs
+CHUNK_LISTINGS = 250       # listings simulated per array batch (CHUNK_LISTINGS x DRAWS floats)
+WORKERS = None             # process count to spread chunks over; None runs in-process
+REPORT_ROWS = 20
+
+
+# ===== Simulation =====
+def payment_factors(rate, years, draws=DRAWS, seed=None):
+    """
+    Average monthly payment per dollar borrowed over HORIZON_YEARS of a random
+    walk starting at rate, one value per draw. Shared by every listing.
+    """
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, RATE_VOLATILITY, size=(draws, HORIZON_YEARS))
+    steps[:, 0] = 0.0                                  # the first year is at today's rate
+    paths = np.maximum(rate + np.cumsum(steps, axis=1), RATE_FLOOR)
+    return finance.annuity_factors(paths, years).mean(axis=1)
+
+
+def _simulate_chunk(principals, rents, costs, factors, seed):
+    """P5/P50/P95 and P(negative) of one chunk of listings, as (4, listings)."""
+    rng = np.random.default_rng(seed)
+    shape = (len(principals), len(factors))
+    rent = rents[:, None] * rng.lognormal(-RENT_VOLATILITY ** 2 / 2, RENT_VOLATILITY, size=shape)
+    vacancy = rng.beta(VACANCY_MEAN * VACANCY_CONCENTRATION,
+                       (1 - VACANCY_MEAN) * VACANCY_CONCENTRATION, size=shape)
+    expenses = costs[:, None] * rng.lognormal(-EXPENSE_VOLATILITY ** 2 / 2, EXPENSE_VOLATILITY, size=shape)
+    cashflow = rent * (1 - vacancy) - expenses - principals[:, None] * factors
+    p5, p50, p95 = np.percentile(cashflow, [5, 50, 95], axis=1)
+    return np.stack([p5, p50, p95, (cashflow < 0).mean(axis=1)])
+
+
+def simulate(prices, rents, costs, down_payment, rate, years, cmhc=True, draws=DRAWS,
+             seed=None, workers=WORKERS):
+    """
+    Simulated monthly cashflow of every listing. prices, rents and costs are
+    sweep.residential_inputs() / multiplex_inputs() arrays. Returns arrays
+    "p5", "p50", "p95" and "p_negative", one value per listing.
+    Results are the same for a given seed whatever the worker count.
+    """
+    premium = finance.cmhc_premium_rate(down_payment) if cmhc else 0.0
+    principals = np.asarray(prices, dtype=float) * (1 - down_payment) * (1 + premium)
+    rents = np.asarray(rents, dtype=float)
+    costs = np.asarray(costs, dtype=float)
+
+    starts = range(0, len(principals), CHUNK_LISTINGS)
+    rate_seed, *chunk_seeds = np.random.SeedSequence(seed).spawn(1 + len(starts))
+    factors = payment_factors(rate, years, draws, rate_seed)
+    chunks = [(principals[start:start + CHUNK_LISTINGS], rents[start:start + CHUNK_LISTINGS],
+               costs[start:start + CHUNK_LISTINGS], factors, chunk_seed)
+              for start, chunk_seed in zip(starts, chunk_seeds)]
+
+    if workers and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, *zip(*chunks)))
+    else:
+        parts = [_simulate_chunk(*chunk) for chunk in chunks]
+    stats = np.concatenate(parts, axis=1) if parts else np.empty((4, 0))
+    return dict(zip(("p5", "p50", "p95", "p_negative"), stats))
+
+
+# ===== Report =====
+def report(listings, prices, rents, costs, down_payment, rate, years, cmhc=True, rows=REPORT_ROWS,
+           workers=WORKERS):
+    """Simulate listings and print the least risky first (lowest P(negative), then best P50)."""
+    if not len(listings):
+        print("🎲 Monte Carlo: no listings to simulate")
+        return []
+    start = time.perf_counter()
+    stats = simulate(prices, rents, costs, down_payment, rate, years, cmhc=cmhc, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"🎲 Monte Carlo: {DRAWS:,} draws × {len(listings)} listings in {elapsed:.2f}s "
+          f"({HORIZON_YEARS}-year rate paths from {rate:.2%}, {down_payment:.0%} down)")
+
+    results = [{
+        "listing": listing,
+        "p5": float(stats["p5"][i]),
+        "p50": float(stats["p50"][i]),
+        "p95": float(stats["p95"][i]),
+        "p_negative": float(stats["p_negative"][i]),
+    } for i, listing in enumerate(listings)]
+    results.sort(key=lambda row: (row["p_negative"], -row["p50"]))
+
+    print(f"{'Listing':<40} {'P5':>9} {'P50':>9} {'P95':>9} {'P(<0)':>6}")
+    for row in results[:rows]:
+        print(f"{repr(row['listing']):<40} {row['p5']:>9,.0f} {row['p50']:>9,.0f} {row['p95']:>9,.0f} "
+              f"{row['p_negative']:>6.2%}")
+    return results
@@ -0,0 +1,191 @@
+"""
+Multi-objective ranking of investment candidates: cap rate, cash-on-cash,
+cashflow (higher is better) and price per sqft (lower is better) together,
+as the Pareto frontier plus one weighted score per listing.
+
+    python scrapper-milton --from-store --pareto
+"""
+import time
+
+import numpy as np
+
+import finance
+
+# ===== CONFIG =====
+# metric -> (weight in the combined score, True when bigger is better)
+OBJECTIVES = {
+    "cap_rate": (0.30, True),
+    "cash_on_cash": (0.30, True),
+    "cashflow": (0.25, True),
+    "price_per_sqft": (0.15, False),
+}
+BLOCK_ROWS = 256           # rows compared all-pairs at the bottom of the divide and conquer
+REPORT_ROWS = 20
+
+
+# ===== Skyline =====
+def _column_range(values):
+    """Per-column min and max ignoring NaN; 0 for a column with no values (e.g. no sizes known)."""
+    missing = np.isnan(values)
+    low = np.where(missing, np.inf, values).min(axis=0)
+    high = np.where(missing, -np.inf, values).max(axis=0)
+    known = np.isfinite(low)
+    return np.where(known, low, 0.0), np.where(known, high, 0.0)
+
+
+def pareto_front(objectives):
+    """
+    Boolean mask of the non-dominated rows of objectives (listings x metrics,
+    bigger is better in every column, NaN counts as worst).
+
+    Kung et al. divide and conquer: rows are sorted by the first metric, the
+    frontier of each half is found recursively, and the worse half's frontier
+    keeps only the rows no better-half frontier row matches in every other
+    metric. That filter itself splits on one metric at a time down to a
+    two-metric sweep, so even when every row is on the frontier the work is
+    O(n log^(d-1) n), not O(n * frontier). Two metrics take an exact
+    O(n log n) sweep.
+    """
+    values = np.asarray(objectives, dtype=float)
+    if values.ndim != 2 or not len(values):
+        return np.zeros(len(values), dtype=bool)
+    low, high = _column_range(values)
+    span = np.where(high > low, high - low, 1.0)
+    # Scaling keeps dominance; missing values go one step below the worst
+    scaled = np.where(np.isnan(values), -1.0, (values - low) / span)
+
+    # Equal rows do not dominate each other: decide once per distinct row
+    unique, inverse = np.unique(scaled, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if unique.shape[1] == 2:
+        kept = _front_2d(unique)
+    else:
+        kept = _front_divide(unique)
+    return kept[inverse]
+
+
+def _front_2d(points):
+    # Best first metric first (second metric breaking ties); a point is on the
+    # front when its second metric beats every point before it
+    order = np.lexsort((-points[:, 1], -points[:, 0]))
+    second = points[order, 1]
+    best_before = np.maximum.accumulate(np.r_[-np.inf, second[:-1]])
+    kept = np.zeros(len(points), dtype=bool)
+    kept[order[second > best_before]] = True
+    return kept
+
+
+def _at_least(a, b):
+    """(len(a), len(b)) mask of a[i] >= b[j] in every column, one column at a time."""
+    mask = a[:, None, 0] >= b[None, :, 0]
+    for column in range(1, a.shape[1]):
+        mask &= a[:, None, column] >= b[None, :, column]
+    return mask
+
+
+def _front_divide(points):
+    # Best first metric first (later metrics breaking ties): no row is dominated by one after it
+    order = np.lexsort(tuple(-points[:, i] for i in reversed(range(points.shape[1]))))
+    kept = np.zeros(len(points), dtype=bool)
+    kept[_front_rows(points, order)] = True
+    return kept
+
+
+def _front_rows(points, rows):
+    """The non-dominated rows among rows, which come sorted best first metric first."""
+    if len(rows) <= BLOCK_ROWS:
+        # Rows are distinct, so >= everywhere means dominates
+        block = points[rows]
+        dominates = _at_least(block, block)
+        np.fill_diagonal(dominates, False)
+        return rows[~dominates.any(axis=0)]
+    half = len(rows) // 2
+    better = _front_rows(points, rows[:half])
+    worse = _front_rows(points, rows[half:])
+    # Every better-half row already matches the worse half on the first metric
+    covered = _covered(points[better, 1:], points[worse, 1:])
+    return np.concatenate([better, worse[~covered]])
+
+
+def _covered(a, b):
+    """Mask of the rows of b that some row of a is >= in every column."""
+    if not len(a) or not len(b):
+        return np.zeros(len(b), dtype=bool)
+    columns = a.shape[1]
+    if columns == 0:
+        return np.ones(len(b), dtype=bool)
+    if columns == 1:
+        return b[:, 0] <= a[:, 0].max()
+    if columns == 2:
+        # Best second column among the rows of a at least as big in the first
+        order = np.argsort(a[:, 0], kind="stable")
+        first = a[order, 0]
+        best_second = np.maximum.accumulate(a[order, 1][::-1])[::-1]
+        start = np.searchsorted(first, b[:, 0], side="left")
+        covered = np.zeros(len(b), dtype=bool)
+        some = start < len(a)
+        covered[some] = best_second[start[some]] >= b[some, 1]
+        return covered
+    if len(b) == 1 or len(a) * len(b) <= BLOCK_ROWS * BLOCK_ROWS:
+        return _at_least(a, b).any(axis=0)
+
+    # Split b on its first column: the upper half can only be matched by rows of
+    # a at least its minimum there; rows of a at least the lower half's maximum
+    # match that half on the first column and only the rest need checking
+    order = np.argsort(b[:, 0], kind="stable")
+    lower, upper = order[:len(b) // 2], order[len(b) // 2:]
+    covered = np.zeros(len(b), dtype=bool)
+    covered[upper] = _covered(a[a[:, 0] >= b[upper, 0].min()], b[upper])
+    above = a[:, 0] >= b[lower, 0].max()
+    covered[lower] = _covered(a[above, 1:], b[lower, 1:]) | _covered(a[~above], b[lower])
+    return covered
+
+
+# ===== Scores =====
+def objective_matrix(metrics):
+    """finance.investment_metrics() output as (listings x OBJECTIVES), bigger is better."""
+    return np.column_stack([metrics[name] if bigger else -metrics[name]
+                            for name, (_, bigger) in OBJECTIVES.items()])
+
+
+def weighted_scores(objectives):
+    """OBJECTIVES-weighted sum of min-max scaled metrics (missing counts as 0), in [0, 1]."""
+    values = np.asarray(objectives, dtype=float)
+    if not len(values):
+        return np.zeros(0)
+    low, high = _column_range(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = np.where(high > low, (values - low) / (high - low), 1.0)
+    weights = np.array([weight for weight, _ in OBJECTIVES.values()])
+    return np.nan_to_num(scaled, nan=0.0) @ (weights / weights.sum())
+
+
+def rank(listings, prices, rents, costs, down_payment, rate, years, cmhc=True):
+    """
+    Metrics, frontier mask and weighted score of every listing. prices, rents
+    and costs are sweep.residential_inputs() / multiplex_inputs() arrays.
+    """
+    sqft = np.fromiter((listing.sqft or 0.0 for listing in listings), dtype=float, count=len(listings))
+    metrics = finance.investment_metrics(prices, rents, costs, down_payment, rate, years, sqft, cmhc)
+    objectives = objective_matrix(metrics)
+    return dict(metrics, frontier=pareto_front(objectives), score=weighted_scores(objectives))
+
+
+# ===== Report =====
+def report(listings, prices, rents, costs, down_payment, rate, years, cmhc=True, rows=REPORT_ROWS):
+    """Rank listings and print the frontier, best weighted score first. Returns rank()."""
+    start = time.perf_counter()
+    ranked = rank(listings, prices, rents, costs, down_payment, rate, years, cmhc)
+    elapsed = time.perf_counter() - start
+    print(f"🏅 Pareto: {int(ranked['frontier'].sum())} of {len(listings)} listings on the frontier "
+          f"({', '.join(OBJECTIVES)}) in {elapsed:.3f}s")
+
+    on_front = np.flatnonzero(ranked["frontier"])
+    order = on_front[np.argsort(-ranked["score"][on_front], kind="stable")]
+    print(f"{'Listing':<40} {'Cap':>6} {'CoC':>7} {'Cashflow':>9} {'$/sqft':>7} {'Score':>6}")
+    for i in order[:rows]:
+        price_per_sqft = ranked["price_per_sqft"][i]
+        sqft_text = "?" if np.isnan(price_per_sqft) else f"{price_per_sqft:,.0f}"
+        print(f"{repr(listings[i]):<40} {ranked['cap_rate'][i]:>6.2%} {ranked['cash_on_cash'][i]:>7.2%} "
+              f"{ranked['cashflow'][i]:>9,.0f} {sqft_text:>7} {ranked['score'][i]:>6.3f}")
+    return ranked
@@ -0,0 +1,76 @@
+import heapq
+from itertools import count
+
+
+# ===== Keys =====
+def _key_function(key):
+    """
+    key is a callable (bigger is better; return a tuple for tie-breakers) or a
+    sequence of field names read from dicts or attributes, each bigger-first
+    unless prefixed with "-": ("cashflow", "-price") ranks by cashflow, then
+    the cheaper listing on ties.
+    """
+    if callable(key):
+        return key
+    if isinstance(key, str):
+        key = (key,)
+    fields = [(name.lstrip("-"), name.startswith("-")) for name in key]
+
+    def key_of(item):
+        values = []
+        for name, ascending in fields:
+            value = item[name] if isinstance(item, dict) else getattr(item, name)
+            values.append(-value if ascending else value)
+        return tuple(values)
+    return key_of
+
+
+# ===== Bounded top K =====
+class TopK:
+    """
+    The k best items overall or per group, kept in bounded min-heaps as items
+    stream in: memory is k items per group and nothing is ever fully sorted.
+    Equal keys keep the earlier item, as sorted(..., reverse=True)[:k] would.
+
+        top = TopK(4, key="cashflow", group=lambda prop: prop["city"])
+        top.extend(props)
+        top.groups()        # {"London": [best, ...], ...}
+    """
+
+    def __init__(self, k, key, group=None):
+        self.k = k
+        self.key = _key_function(key)
+        self.group = group
+        self.heaps = {}
+        self._order = count()
+
+    def push(self, item):
+        """Offer one item; returns True when it is (for now) in its group's top k."""
+        if self.k <= 0:
+            return False
+        heap = self.heaps.setdefault(self.group(item) if self.group else None, [])
+        # The heap root is the worst kept item; on equal keys the later item is worse
+        entry = (self.key(item), -next(self._order), item)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+            return True
+        return heapq.heappushpop(heap, entry) is not entry
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+        return self
+
+    def best(self, group=None):
+        """Kept items of one group (all items when ungrouped), best first."""
+        return [entry[2] for entry in sorted(self.heaps.get(group, ()), reverse=True)]
+
+    def groups(self):
+        """{group: kept items best first}, groups in the order they were first seen."""
+        return {group: self.best(group) for group in self.heaps}
+
+
+def top_k(items, k, key, group=None):
+    """Best k items (per group when group is given) of any iterable, e.g. stored rows."""
+    top = TopK(k, key, group).extend(items)
+    return top.groups() if group else top.best()
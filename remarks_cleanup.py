@@ -0,0 +1,51 @@
+import re
+from functools import lru_cache
+
+# ===== CONFIG =====
+CACHE_SIZE = 4096          # summaries kept per process
+
+# Listing codes like "(X12345)", then "Welcome to ..." openers. Two passes: removing
+# a code can join words, and a joined "welcome" no longer starts at a word boundary
+_LISTING_CODE = re.compile(r"\([A-Za-z0-9]+\)")
+_WELCOME = re.compile(r"\bWelcome to [^\n.?!]*[\n.?!-]+", re.IGNORECASE)
+
+
+# ===== Cleanup =====
+def _remove_literal(text, literal):
+    """Remove every case-insensitive occurrence of literal, without compiling a pattern for it."""
+    if not literal:
+        return text
+    if not (text.isascii() and literal.isascii()):
+        # lower() may change the length of non-ASCII text, so positions would not line up
+        return re.sub(re.escape(literal), "", text, flags=re.IGNORECASE)
+    lowered, needle = text.lower(), literal.lower()
+    parts, start = [], 0
+    found = lowered.find(needle)
+    while found != -1:
+        parts.append(text[start:found])
+        start = found + len(needle)
+        found = lowered.find(needle, start)
+    parts.append(text[start:])
+    return "".join(parts)
+
+
+def clean_remarks(remarks, address_text=""):
+    """PublicRemarks without the listing's own address, listing codes and "Welcome to ..." openers."""
+    remarks = _LISTING_CODE.sub("", _remove_literal(remarks, address_text))
+    return _WELCOME.sub("", remarks).strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def summarize(remarks, address_text="", highlights=None):
+    """
+    First sentence of the cleaned remarks, with highlights (a keywords.KeywordMatcher)
+    set in bold, or "" when nothing is left. Cached on the remarks, so the same
+    text seen again in a run (relisted, or in two regions) is processed once.
+    """
+    remarks = clean_remarks(remarks, address_text)
+    if not remarks:
+        return ""
+    first_sentence = remarks.split(".")[0].strip()
+    if highlights is not None:
+        first_sentence = highlights.highlight(first_sentence)
+    return first_sentence + "."
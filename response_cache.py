@@ -0,0 +1,224 @@
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+# ===== CONFIG =====
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses")
+MAX_CACHE_BYTES = 200 * 1024 * 1024     # LRU eviction above 200 MB of compressed bodies
+EVICT_TARGET = 0.9                      # evict down to this share of MAX_CACHE_BYTES, so walks stay rare
+DEFAULT_TTL = 60 * 60                   # 1 hour
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Realtor-JsonObj.json")
+
+# Per-market TTL in seconds; markets that move slower can be cached longer
+MARKET_TTLS = {
+    "Milton": 60 * 60,
+    "Oakville": 60 * 60,
+    "Burlington": 60 * 60,
+    "Brampton": 30 * 60,
+    "Mississauga": 30 * 60,
+    "Caledon": 2 * 60 * 60,
+    "London": 2 * 60 * 60,
+    "KWC": 2 * 60 * 60,
+    "Brantford": 4 * 60 * 60,
+}
+
+OFFLINE = False     # replay from the cache only, never touch the network
+
+_lock = threading.Lock()
+_cache_bytes = None     # running size of the cache, scanned once per process
+
+
+# ===== Keys and paths =====
+def cache_key(url, payload=None):
+    """Content address for a request: sha256 of the URL plus the sorted form payload."""
+    blob = json.dumps([url, sorted((payload or {}).items())], separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".json.gz")
+
+
+def ttl_for(market):
+    # Tiles are named "market/i" and share their market's TTL
+    market = (market or "").split("/")[0]
+    return MARKET_TTLS.get(market, DEFAULT_TTL)
+
+
+# ===== Read / write =====
+# Each entry is a gzip file: one JSON header line ({"created", "url", "market"})
+# followed by the raw response body, so bodies can be streamed in and out.
+def open_cached(url, payload=None, market=None):
+    """
+    Return a binary file object positioned at the cached body for this request,
+    or None on a miss. Entries older than the market's TTL count as misses
+    unless OFFLINE is set. The caller closes the file.
+    """
+    path = cache_path(cache_key(url, payload))
+    try:
+        f = gzip.open(path, "rb")
+        header = json.loads(f.readline())
+    except (OSError, ValueError, EOFError):
+        return None
+
+    if not OFFLINE and time.time() - header.get("created", 0) > ttl_for(market):
+        f.close()
+        return None
+
+    # Touch the file so eviction treats it as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return f
+
+
+def load(url, payload=None, market=None):
+    """Return the cached raw response text for this request, or None on a miss."""
+    f = open_cached(url, payload, market)
+    if f is None:
+        return None
+    try:
+        return f.read().decode("utf-8")
+    except (OSError, EOFError):
+        return None
+    finally:
+        f.close()
+
+
+class CacheWriter:
+    """Streams a response body into a temporary entry; commit() publishes it."""
+
+    def __init__(self, url, payload=None, market=None):
+        self.path = cache_path(cache_key(url, payload))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        self.file = gzip.open(self.tmp_path, "wb")
+        header = {"created": time.time(), "url": url, "market": market}
+        self.file.write(json.dumps(header).encode("utf-8") + b"\n")
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.file.write(data)
+
+    def commit(self):
+        self.file.close()
+        try:
+            replaced = os.path.getsize(self.path)
+        except OSError:
+            replaced = 0
+        os.replace(self.tmp_path, self.path)
+        # Only walk the cache tree again once the running total crosses the limit
+        if _account(os.path.getsize(self.path) - replaced):
+            evict(int(MAX_CACHE_BYTES * EVICT_TARGET))
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def store(url, payload, body, market=None):
+    """Compress and store a raw response body, evicting old entries once over MAX_CACHE_BYTES."""
+    writer = CacheWriter(url, payload, market)
+    writer.write(body)
+    writer.commit()
+
+
+def _entries():
+    """(mtime, size, path) of every cache entry."""
+    entries = []
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json.gz"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def _account(added):
+    """Add to the running cache size; True when it is now above MAX_CACHE_BYTES."""
+    global _cache_bytes
+    with _lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(size for _, size, _ in _entries())
+        else:
+            _cache_bytes += added
+        return _cache_bytes > MAX_CACHE_BYTES
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes (MAX_CACHE_BYTES)."""
+    global _cache_bytes
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    with _lock:
+        entries = sorted(_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        _cache_bytes = total
+
+
+# ===== Fixtures and CLI flags =====
+def seed(url, payload, fixture_path=FIXTURE_FILE, market=None):
+    """
+    Store a saved response as the cached answer for a request. The fixture may be
+    a full PropertySearch_Post body, a list of listings, or a single listing such
+    as Realtor-JsonObj.json.
+    """
+    with open(fixture_path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if isinstance(data, dict) and "Results" in data:
+        body = data
+    else:
+        results = data if isinstance(data, list) else [data]
+        body = {
+            "Results": results,
+            "Paging": {
+                "RecordsPerPage": len(results),
+                "CurrentPage": 1,
+                "TotalRecords": len(results),
+                "TotalPages": 1,
+            },
+        }
+
+    page_payload = dict(payload, CurrentPage=str(payload.get("CurrentPage", "1")))
+    store(url, page_payload, json.dumps(body), market=market)
+
+
+def apply_cli_flags(url, regions, argv=None):
+    """
+    Handle the shared command line flags of the PropertySearch_Post scripts:
+      --offline  replay cached responses only
+      --seed     load Realtor-JsonObj.json as the cached answer for every region
+    """
+    global OFFLINE
+    argv = sys.argv[1:] if argv is None else argv
+
+    if "--seed" in argv:
+        for name, payload in regions.items():
+            seed(url, payload, market=name)
+        print(f"🌱 Seeded {len(regions)} regions from {os.path.basename(FIXTURE_FILE)}")
+
+    if "--offline" in argv:
+        OFFLINE = True
+        print("📴 Offline mode: replaying cached responses only")
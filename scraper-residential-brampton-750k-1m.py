@@ -1,5 +1,19 @@
 import os
-import requests
+from apify_client import iter_dataset_items, iter_chunks
+from listing import Listing, RAW_FIELDS
+from listing_table import ListingTable
+from hash_cache import ListingCache, source_version
+from keywords import KeywordMatcher
+from listing_query import ListingQuery
+import listing_store
+import history
+import finance
+import sweep
+import montecarlo
+import pareto
+from ranking import TopK
+import time
+import sys
 import math
 from datetime import datetime
 
@@ -16,115 +30,69 @@ TOP_N = 5
 # ===== STEP 1. Fetch Latest Dataset from Apify =====
 def fetch_latest_properties():
     url = f"https://api.apify.com/v2/actor-tasks/{TASK_ID}/runs/last/dataset/items?token={APIFY_TOKEN}"
-    res = requests.get(url)
-    res.raise_for_status()
-    return res.json()
+    return map(Listing.from_raw, iter_dataset_items(url, projection=RAW_FIELDS))
 
 # ===== STEP 2. Mortgage Helper Functions =====
-def cmhc_premium_rate(downpayment_percent):
-    if downpayment_percent < 0.10:
-        return 0.04
-    elif downpayment_percent < 0.15:
-        return 0.031
-    elif downpayment_percent < 0.20:
-        return 0.028
-    return 0.0
-
-def calculate_monthly_payment(price, downpayment_percent=0.05, rate=MORTGAGE_RATE, years=AMORTIZATION_YEARS):
-    """
-    Calculate mortgage with minimum downpayment rules + CMHC insurance if <20%.
-    """
-    downpayment = price * downpayment_percent
-    mortgage_amount = price - downpayment
+DOWN_PAYMENTS = (0.10, 0.20)     # Scenario 1 (first time buyers), Scenario 2 (investment buyers)
 
-    # CMHC insurance estimate (if <20% downpayment)
-    cmhc_fee = cmhc_premium_rate(downpayment_percent) * mortgage_amount
-    mortgage_amount += cmhc_fee
-
-    monthly_rate = rate / 12
-    n_payments = years * 12
-    monthly_payment = mortgage_amount * (monthly_rate * (1 + monthly_rate) ** n_payments) / ((1 + monthly_rate) ** n_payments - 1)
-    return monthly_payment, downpayment
+def calculate_cashflows(props):
+    """Payments, tax and cashflows of post records at every DOWN_PAYMENTS share, in one NumPy pass."""
+    return finance.residential_cashflows(
+        [float(prop.get("price", 0)) for prop in props],
+        [float(prop.get("tax_amount", 0)) for prop in props],
+        DOWN_PAYMENTS, BASEMENT_RENT + UPSTAIRS_RENT, MORTGAGE_RATE, AMORTIZATION_YEARS)
 
 # ===== STEP 3. Filter Listings =====
 LEGAL_BASEMENT_KEYWORDS = [
     "legal basement", "separate entrance", "in-law suite",
     "second dwelling", "income potential", "finished basement"
 ]
-
-def has_legal_basement(description: str) -> bool:
-    description = description.lower()
-    return any(kw in description for kw in LEGAL_BASEMENT_KEYWORDS)
-
-def filter_properties(properties):
-    filtered = []
-    for prop in properties:
-        try:
-            building = prop.get("Building", {})
-            property_info = prop.get("Property", {})
-
-            # Bedrooms: sum of above and below ground
-            bedrooms_above = int(building.get("BedroomsAboveGround", 0))
-            bedrooms_below = int(building.get("BedroomsBelowGround", 0))
-            bedrooms = bedrooms_above + bedrooms_below
-
-            # Bathrooms
-            bathrooms = int(building.get("BathroomTotal", 0))
-
-            # Parking
-            parking = int(property_info.get("ParkingSpaceTotal", 0))
-
-            # Year built: not available, so skip this filter or use DisplayAsYears as age
-            age = building.get("DisplayAsYears")
-            year_built = CURRENT_YEAR - int(age) if age and age.isdigit() else CURRENT_YEAR
-
-            # Description: use PublicRemarks and BasementFeatures
-            description = (prop.get("PublicRemarks", "") + " " + building.get("BasementFeatures", "")).lower()
-
-            if (bedrooms >= 3 and bathrooms >= 2 and parking >= 2 and 
-                (CURRENT_YEAR - year_built) <= 35 and has_legal_basement(description)):
-                address_text = property_info.get("Address", {}).get("AddressText", "")
-                area = ""
-                if "|" in address_text:
-                    area = address_text.split("|")[1].split(",")[0].strip()
-                amenities = property_info.get("AmmenitiesNearBy", "")
-                lot_size = prop.get("Land", {}).get("SizeTotal", "")
-                basement_features = building.get("BasementFeatures", "")
-                if amenities and lot_size and basement_features:
-                    filtered.append({
-                        # "address": address_text,  # address removed from post
-                        "area": area,
-                        "bedrooms": bedrooms,
-                        "bathrooms": bathrooms,
-                        "parking": parking,
-                        "yearBuilt": year_built,
-                        "description": description,
-                        "price": property_info.get("PriceUnformattedValue", 0),
-                        "amenities": amenities,
-                        "lot_size": lot_size,
-                        "basement_features": basement_features,
-                        "tax_amount": float(property_info.get("TaxAmount", "0").replace("$", "").replace(",", "").strip() or 0),
-                        # "url": "https://www.realtor.ca" + prop.get("RelativeURLEn", "")
-                    })
-        except Exception:
-            continue
-    return filtered
+LEGAL_BASEMENT = KeywordMatcher(LEGAL_BASEMENT_KEYWORDS)
+
+# Numeric thresholds are checked first over the whole batch, then the text fields
+LISTING_QUERY = ListingQuery("""
+    bedrooms_above + bedrooms_below >= 3    # sum of above and below ground
+    bathrooms >= 2
+    parking >= 2
+    age <= 35 or missing                    # year built is not available: DisplayAsYears, missing counts as new
+    amenities is set
+    lot_size is set
+    basement_features is set
+    remarks + basement_features matches LEGAL_BASEMENT
+""", matchers={"LEGAL_BASEMENT": LEGAL_BASEMENT})
+
+def property_record(listing):
+    """Post record of a listing that passed LISTING_QUERY."""
+    # Description: use PublicRemarks and BasementFeatures
+    description = (listing.remarks + " " + listing.basement_features).lower()
+    return {
+        # "address": listing.address_text,  # address removed from post
+        "area": listing.area,
+        "bedrooms": listing.bedrooms_above + listing.bedrooms_below,
+        "bathrooms": listing.bathrooms,
+        "parking": listing.parking,
+        "yearBuilt": CURRENT_YEAR - (listing.age or 0),
+        "description": description,
+        "price": listing.price,
+        "amenities": listing.amenities,
+        "lot_size": listing.lot_size,
+        "basement_features": listing.basement_features,
+        "tax_amount": listing.tax_amount,
+        # "url": "https://www.realtor.ca" + listing.relative_url
+    }
 
 # ===== STEP 4. Create WhatsApp Post =====
-def format_whatsapp_post(prop):
+def format_whatsapp_post(prop, cashflows=None, row=0):
+    """cashflows: calculate_cashflows() of a batch holding prop at index row (computed here if not given)."""
     price = float(prop.get("price", 0))
-
-    monthly_payment_10, downpayment_10 = calculate_monthly_payment(price, downpayment_percent=0.10)
-    monthly_payment_20, downpayment_20 = calculate_monthly_payment(price, downpayment_percent=0.20)
-
-    # Calculate monthly property tax from TaxAmount field
-    monthly_tax = float(prop.get('tax_amount', 0)) / 12
-    monthly_utilities = 300.0
-    monthly_ins_misc = 200.0
-
-    total_rent = BASEMENT_RENT + UPSTAIRS_RENT
-    cashflow_10 = total_rent - (monthly_payment_10 + monthly_tax + monthly_utilities + monthly_ins_misc)
-    cashflow_20 = total_rent - (monthly_payment_20 + monthly_tax + monthly_utilities + monthly_ins_misc)
+    if cashflows is None:
+        cashflows = calculate_cashflows([prop])
+
+    monthly_payment_10, monthly_payment_20 = cashflows["payment"][row]
+    # Monthly property tax from TaxAmount field
+    monthly_tax = cashflows["monthly_tax"][row]
+    monthly_ins_misc = finance.MONTHLY_INS_MISC
+    cashflow_10, cashflow_20 = cashflows["cashflow"][row]
     
     area_text = prop.get('area', '')
     area_line = f"🔥 *Investment Opportunity in {area_text}*" if area_text else "🔥 *Investment Opportunity*"
@@ -199,31 +167,86 @@ def format_whatsapp_post(prop):
 {exclusive_section}
     """
 
+# ===== STEP 5. Evaluate Listings =====
+def evaluate_listings(listings):
+    """
+    Filter, score (cashflow at 20% down) and render a batch of listings.
+    Returns one entry per listing, None where the listing does not qualify.
+    """
+    table = ListingTable(listings)
+    matched = [(i, property_record(table.listings[i])) for i in LISTING_QUERY.indices(table)]
+
+    entries = [None] * len(table)
+    if not matched:
+        return entries
+    # Every scenario of every matched listing at once; the score is rent - payment at 20% down
+    cashflows = calculate_cashflows([prop for _, prop in matched])
+    scores = cashflows["cashflow_before_costs"][:, DOWN_PAYMENTS.index(0.20)]
+    for row, (i, prop) in enumerate(matched):
+        entries[i] = {"record": prop, "score": float(scores[row]),
+                      "post": format_whatsapp_post(prop, cashflows, row)}
+    return entries
+
 # ===== MAIN PIPELINE =====
 if __name__ == "__main__":
-    all_listings = fetch_latest_properties()
-
-    filtered = filter_properties(all_listings)
-
-    print(f"Listings matching criteria: {len(filtered)}")
-
-    # Take top N (sorted by cashflow estimate at 20% down)
-    scored = []
-    for prop in filtered:
-        price = float(prop.get("price", 0))
-        monthly_payment, _ = calculate_monthly_payment(price, downpayment_percent=0.20)
-        total_rent = BASEMENT_RENT + UPSTAIRS_RENT
-        cashflow = total_rent - monthly_payment
-        scored.append((cashflow, prop))
-
-    scored.sort(reverse=True, key=lambda x: x[0])
-    top_props = [prop for _, prop in scored[:TOP_N]]
+    # --from-store re-ranks the listings stored by earlier runs instead of refetching
+    from_store = "--from-store" in sys.argv
+    if from_store:
+        chunks = [listing_store.load_listings(source="apify-brampton-750k-1m")]
+    else:
+        # Fetched listings are saved, snapshotted and evaluated a chunk at a time, never all held at once
+        started = time.time()
+        chunks = iter_chunks(fetch_latest_properties())
+
+    # Only listings whose HashCode changed since the last run are filtered, scored and rendered
+    cache = ListingCache("apify-brampton-750k-1m", fingerprint=[
+        MORTGAGE_RATE, AMORTIZATION_YEARS, BASEMENT_RENT, UPSTAIRS_RENT, CURRENT_YEAR,
+        LISTING_QUERY.text, LEGAL_BASEMENT_KEYWORDS,
+        # Filter and post template code: editing either re-renders every listing
+        source_version(__file__, Listing, ListingTable, ListingQuery, KeywordMatcher, finance)])
+    matched, evaluated = [], []
+    for chunk in chunks:
+        if not from_store:
+            listing_store.save_listings(chunk, source="apify-brampton-750k-1m")
+            history.append_snapshot(chunk, market="apify-brampton-750k-1m")
+        for listing, entry in zip(chunk, cache.derive_batch(chunk, evaluate_listings)):
+            if entry:
+                matched.append(listing)
+                evaluated.append(entry)
+    if not from_store:
+        # A full fetch saw every listing still for sale: stored rows it missed are no longer live
+        listing_store.record_run("apify-brampton-750k-1m", started)
+    cache.save()
+    cache.report()
+
+    print(f"Listings matching criteria: {len(evaluated)}")
+    if "--filter-stats" in sys.argv:
+        LISTING_QUERY.report()
+
+    inputs = sweep.residential_inputs(matched, BASEMENT_RENT + UPSTAIRS_RENT)
+    # --sweep: every rate x down payment x amortization x rent level over the matching listings
+    if "--sweep" in sys.argv:
+        sweep.report(matched, *inputs, down_payment=0.20, years=AMORTIZATION_YEARS, top_n=TOP_N)
+    # --montecarlo: cashflow percentiles under random rate paths, vacancy, rents and costs
+    if "--montecarlo" in sys.argv:
+        montecarlo.report(matched, *inputs, down_payment=0.20, rate=MORTGAGE_RATE, years=AMORTIZATION_YEARS)
+
+    # Rank by cashflow estimate at 20% down, or with --pareto frontier listings
+    # first (cap rate, cash-on-cash, price/sqft, cashflow), best weighted score first
+    keys = [(entry["score"],) for entry in evaluated]
+    if "--pareto" in sys.argv:
+        ranked = pareto.report(matched, *inputs, down_payment=0.20, rate=MORTGAGE_RATE, years=AMORTIZATION_YEARS)
+        keys = list(zip(ranked["frontier"].tolist(), ranked["score"].tolist()))
+
+    # Take top N (bounded heap, no full sort)
+    top = TopK(TOP_N, key=lambda i: keys[i]).extend(range(len(evaluated)))
+    top_props = [evaluated[i] for i in top.best()]
 
     # Output WhatsApp-style posts and write to file
     output_lines = []
-    for idx, prop in enumerate(top_props, 1):
+    for idx, entry in enumerate(top_props, 1):
         output_lines.append(f"\n=== Property #{idx} ===")
-        output_lines.append(format_whatsapp_post(prop))
+        output_lines.append(entry["post"])
 
     output_text = '\n'.join(output_lines)
     print(output_text)
@@ -1,5 +1,21 @@
 import os
-import requests
+from functools import partial
+from apify_client import iter_dataset_items, iter_chunks
+from listing import Listing, RAW_FIELDS
+from hash_cache import ListingCache, source_version
+from keywords import KeywordMatcher
+from listing_query import ListingQuery
+from listing_table import ListingTable
+import remarks_cleanup
+import listing_store
+import history
+import finance
+import sweep
+import montecarlo
+import pareto
+from ranking import TopK
+import time
+import sys
 
 # === CONFIG ===
 APIFY_TOKEN = os.getenv("APIFY_TOKEN")  # set with: export APIFY_TOKEN="your-token"
@@ -11,6 +27,12 @@ AMORT_YEARS = 25       # 25-year amortization
 
 MULTIPLEX_TYPES = ["duplex", "triplex", "fourplex", "multiplex", "quadruplex", "4plex"]
 
+# Investment keywords set in bold in the summary sentence
+HIGHLIGHT_KEYWORDS = ["income", "rent", "investment", "cashflow", "tenant", "legal", "triplex", "duplex", "multiplex"]
+HIGHLIGHTS = KeywordMatcher(HIGHLIGHT_KEYWORDS)
+
+MULTIPLEX_QUERY = ListingQuery(f"building_type in ({', '.join(MULTIPLEX_TYPES)})")
+
 AVG_RENT_MAP = {
     "London": 1500,
     "Kitchener": 1700,
@@ -21,87 +43,54 @@ AVG_RENT_MAP = {
 
 def fetch_dataset(dataset_id):
     url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?token={APIFY_TOKEN}"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    return resp.json()
-
-
-def monthly_mortgage(principal, annual_rate=MORTGAGE_RATE, years=AMORT_YEARS):
-    monthly_rate = annual_rate / 12
-    n = years * 12
-    return principal * (monthly_rate * (1 + monthly_rate) ** n) / ((1 + monthly_rate) ** n - 1)
+    # City or Municipality only, as this script always grouped: no AddressText fallback, so a missing city stays "Unknown"
+    return map(partial(Listing.from_raw, address_city=False), iter_dataset_items(url, projection=RAW_FIELDS))
 
 
 def estimate_cashflow(price, units, city):
+    """price and units come already parsed from the Listing; no units means no estimate."""
     avg_rent = AVG_RENT_MAP.get(city, 1500)
-    try:
-        units = int(units)
-        price = int(str(price).replace("$", "").replace(",", ""))
-    except:
+    if not units:
         return None
 
-    monthly_income = units * avg_rent
-    mortgage_principal = price * (1 - DOWN_PAYMENT)
-    mortgage_payment = monthly_mortgage(mortgage_principal)
-    expenses = (price * 0.02) / 12
-    cashflow = monthly_income - (mortgage_payment + expenses)
+    cf = finance.multiplex_cashflows(price, units, avg_rent, DOWN_PAYMENT, MORTGAGE_RATE, AMORT_YEARS)
+    return {name: int(value) for name, value in cf.items()}
 
-    return {
-        "income": int(monthly_income),
-        "mortgage": int(mortgage_payment),
-        "expenses": int(expenses),
-        "cashflow": int(cashflow)
-    }
 
+def estimate_cashflows(listings):
+    """estimate_cashflow for a batch of listings in one NumPy pass; None where a listing has no units."""
+    cf = finance.multiplex_cashflows(
+        [listing.price for listing in listings], [listing.units for listing in listings],
+        [AVG_RENT_MAP.get(listing.city or "Unknown", 1500) for listing in listings],
+        DOWN_PAYMENT, MORTGAGE_RATE, AMORT_YEARS)
+    # astype(int) truncates like int() did
+    columns = {name: values.astype(int).tolist() for name, values in cf.items()}
+    return [dict(zip(columns, row)) if listing.units else None
+            for listing, row in zip(listings, zip(*columns.values()))]
 
-def format_property(item):
-    building = item.get("Building", {})
-    property_info = item.get("Property", {})
-    address_info = property_info.get("Address", {})
-    ameneties = property_info.get("AmmenitiesNearBy", [])
 
-    city = address_info.get("City") or address_info.get("Municipality") or "Unknown"
+def format_property(listing, cf=None):
+    """cf: this listing's estimate_cashflows() entry, estimated here when not given."""
+    ameneties = listing.amenities
 
-    prop_type = building.get("Type", "")
-    if not prop_type:
-        return None
+    city = listing.city or "Unknown"
 
-    prop_type_norm = prop_type.lower().replace("-", "").replace(" ", "")
-    valid_types = [x.replace("-", "").replace(" ", "") for x in MULTIPLEX_TYPES]
-    if prop_type_norm not in valid_types:
+    prop_type = listing.building_type
+    if not MULTIPLEX_QUERY.matches(listing):
         return None
 
-    community = (
-        address_info.get("LocalLogicNeighbourHood")
-        or address_info.get("Subdivision")
-        or address_info.get("Province")
-        or "Unknown Area"
-    )
+    community = listing.neighbourhood or listing.province or "Unknown Area"
+
+    price = listing.price_text or "N/A"
+    units = listing.units or "N/A"
+    beds = listing.bedrooms_text or "N/A"
+    baths = listing.bathrooms or "N/A"
+
+    address_text = listing.address_text
+    summary_remarks = remarks_cleanup.summarize(listing.remarks, address_text, HIGHLIGHTS)
 
-    price = property_info.get("Price", "N/A")
-    units = building.get("TotalUnits", building.get("UnitTotal", "N/A"))
-    beds = building.get("Bedrooms", "N/A")
-    baths = building.get("BathroomTotal", "N/A")
-
-    import re
-    remarks = item.get("PublicRemarks", "")
-    address_text = address_info.get("AddressText", "")
-    if address_text:
-        remarks = re.sub(re.escape(address_text), "", remarks, flags=re.IGNORECASE)
-    remarks = re.sub(r"\([A-Za-z0-9]+\)", "", remarks)
-    remarks = remarks.strip()
-    remarks = re.sub(r"\bWelcome to [^\n.?!]*[\n.?!-]+", "", remarks, flags=re.IGNORECASE)
-
-    summary_remarks = ""
-    if remarks:
-        first_sentence = remarks.split(".")[0].strip()
-        keywords = ["income", "rent", "investment", "cashflow", "tenant", "legal", "triplex", "duplex", "multiplex"]
-        for kw in keywords:
-            if kw in first_sentence.lower():
-                first_sentence = re.sub(f"(?i)({kw})", r"*\1*", first_sentence)
-        summary_remarks = first_sentence + "."
-
-    cf = estimate_cashflow(price, units, city)
+    if cf is None:
+        cf = estimate_cashflow(listing.price, listing.units, city)
     if not cf:
         return None
 
@@ -149,14 +138,67 @@ def format_property(item):
     }
 
 
-def prepare_whatsapp_message():
-    listings = fetch_dataset(DATASET_ID)
-    city_groups = {}
+def format_properties(listings):
+    """format_property over a batch: the type filter and all cashflows run once for the whole batch."""
+    table = ListingTable(listings)
+    entries = [None] * len(table)
+    matched = MULTIPLEX_QUERY.indices(table)
+    cfs = estimate_cashflows([table.listings[i] for i in matched])
+    for i, cf in zip(matched, cfs):
+        entries[i] = format_property(table.listings[i], cf)
+    return entries
+
 
-    for item in listings:
-        prop = format_property(item)
-        if prop and prop["cashflow"] > 500:
-            city_groups.setdefault(prop["city"], []).append(prop)
+def prepare_whatsapp_message():
+    # --from-store re-ranks the listings stored by earlier runs instead of refetching
+    from_store = "--from-store" in sys.argv
+    if from_store:
+        chunks = [listing_store.load_listings(source="apify-multiplex-london-kwc-brantford")]
+    else:
+        # Fetched listings are saved, snapshotted and formatted a chunk at a time, never all held at once
+        started = time.time()
+        chunks = iter_chunks(fetch_dataset(DATASET_ID))
+
+    # format_property only runs for listings whose HashCode changed since the last run
+    cache = ListingCache("apify-multiplex-london-kwc-brantford", fingerprint=[
+        MORTGAGE_RATE, DOWN_PAYMENT, AMORT_YEARS, AVG_RENT_MAP, MULTIPLEX_QUERY.text, HIGHLIGHT_KEYWORDS,
+        # Filter and post template code: editing either re-renders every listing
+        source_version(__file__, Listing, ListingTable, ListingQuery, KeywordMatcher, remarks_cleanup, finance)])
+    matched, kept = [], []
+    for chunk in chunks:
+        if not from_store:
+            listing_store.save_listings(chunk, source="apify-multiplex-london-kwc-brantford")
+            history.append_snapshot(chunk, market="apify-multiplex-london-kwc-brantford")
+        for listing, prop in zip(chunk, cache.derive_batch(chunk, format_properties)):
+            if prop:
+                matched.append(listing)
+                kept.append(prop)
+    if not from_store:
+        # A full fetch saw every listing still for sale: stored rows it missed are no longer live
+        listing_store.record_run("apify-multiplex-london-kwc-brantford", started)
+    cache.save()
+    cache.report()
+
+    inputs = sweep.multiplex_inputs(matched, AVG_RENT_MAP, 1500)
+    # --sweep: every rate x down payment x amortization x rent level over the multiplexes
+    if "--sweep" in sys.argv:
+        sweep.report(matched, *inputs, down_payment=DOWN_PAYMENT, years=AMORT_YEARS, cmhc=False, top_n=4)
+    # --montecarlo: cashflow percentiles under random rate paths, vacancy, rents and costs
+    if "--montecarlo" in sys.argv:
+        montecarlo.report(matched, *inputs, down_payment=DOWN_PAYMENT, rate=MORTGAGE_RATE, years=AMORT_YEARS,
+                          cmhc=False)
+
+    # Best 4 per city by cashflow, or with --pareto frontier listings first (cap rate,
+    # cash-on-cash, price/sqft, cashflow), best weighted score first
+    keys = [(prop["cashflow"],) for prop in kept]
+    if "--pareto" in sys.argv:
+        ranked = pareto.report(matched, *inputs, down_payment=DOWN_PAYMENT, rate=MORTGAGE_RATE, years=AMORT_YEARS,
+                               cmhc=False)
+        keys = list(zip(ranked["frontier"].tolist(), ranked["score"].tolist()))
+    # Bounded heaps per city, fed only listings clearing $500/mo
+    top_by_city = TopK(4, key=lambda i: keys[i], group=lambda i: kept[i]["city"])
+    top_by_city.extend(i for i, prop in enumerate(kept) if prop["cashflow"] > 500)
+    city_groups = {city: [kept[i] for i in best] for city, best in top_by_city.groups().items()}
 
     message = "🔥 Top Investment Opportunities 🔥\n\n"
 
@@ -167,7 +209,7 @@ def prepare_whatsapp_message():
         if city not in city_groups:
             continue
        ## message += f"📍 {city}\n"
-        top_props = sorted(city_groups[city], key=lambda x: x["cashflow"], reverse=True)[:4]
+        top_props = city_groups[city]
         for i, p in enumerate(top_props, start=1):
             message += f"{p['text']}\n"
 
@@ -0,0 +1,140 @@
+"""
+Scenario grid over rates x down payments x amortizations x rent levels for a
+batch of listings, as one broadcast array, with per-listing break-even rates
+and how stable each listing's rank is across the grid.
+
+    python api-scraper-residential-halton.py --from-store --sweep
+"""
+import time
+
+import numpy as np
+
+import finance
+
+# ===== CONFIG =====
+RATES = np.round(np.arange(0.03, 0.07001, 0.0025), 4)      # 3% .. 7%
+DOWN_PAYMENTS = (0.05, 0.10, 0.15, 0.20, 0.25)
+AMORTIZATIONS = (25, 30)
+RENT_LEVELS = (0.90, 1.00, 1.10)                          # x the script's rents
+MAX_BREAK_EVEN_RATE = 0.25     # break-even search ceiling
+REPORT_ROWS = 20
+
+
+# ===== Inputs =====
+def residential_inputs(listings, total_rent, utilities=finance.MONTHLY_UTILITIES,
+                       ins_misc=finance.MONTHLY_INS_MISC):
+    """(prices, monthly rents, monthly non-mortgage costs) of residential listings."""
+    prices = np.fromiter((listing.price for listing in listings), dtype=float, count=len(listings))
+    taxes = np.fromiter((listing.tax_amount for listing in listings), dtype=float, count=len(listings))
+    return prices, np.full(len(listings), float(total_rent)), taxes / 12 + utilities + ins_misc
+
+
+def multiplex_inputs(listings, rent_map, default_rent, expense_ratio=finance.EXPENSE_RATIO):
+    """(prices, monthly rents, monthly expenses) of multiplex listings, rent per unit by city."""
+    prices = np.fromiter((listing.price for listing in listings), dtype=float, count=len(listings))
+    rents = np.fromiter((listing.units * rent_map.get(listing.city or "Unknown", default_rent)
+                         for listing in listings), dtype=float, count=len(listings))
+    return prices, rents, prices * expense_ratio / 12
+
+
+# ===== Grid =====
+def grid_cashflows(prices, rents, costs, rates=RATES, down_payments=DOWN_PAYMENTS,
+                   amortizations=AMORTIZATIONS, rent_levels=RENT_LEVELS, cmhc=True):
+    """
+    Monthly cashflow of every listing in every scenario, shaped
+    (listings, rates, down payments, amortizations, rent levels).
+    """
+    down = np.asarray(down_payments, dtype=float)
+    premium = finance.cmhc_premium_rate(down) if cmhc else np.zeros_like(down)
+    # (listings, down payments)
+    principals = np.asarray(prices, dtype=float)[:, None] * (1 - down) * (1 + premium)
+    # (rates, amortizations), from the per-(rate, years) cache
+    factors = np.array([[finance.annuity_factor(float(rate), years) for years in amortizations]
+                        for rate in rates])
+    payments = principals[:, None, :, None] * factors[None, :, None, :]
+    income = np.asarray(rents, dtype=float)[:, None] * np.asarray(rent_levels, dtype=float)
+    net = income - np.asarray(costs, dtype=float)[:, None]
+    return net[:, None, None, None, :] - payments[..., None]
+
+
+def break_even_rates(prices, rents, costs, down_payment, years, cmhc=True, iterations=40):
+    """
+    The mortgage rate at which each listing's cashflow reaches zero: NaN when it is
+    negative even at 0%, MAX_BREAK_EVEN_RATE when it stays positive beyond it.
+    """
+    premium = finance.cmhc_premium_rate(down_payment) if cmhc else 0.0
+    principals = np.asarray(prices, dtype=float) * (1 - down_payment) * (1 + premium)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        target = (np.asarray(rents, dtype=float) - np.asarray(costs, dtype=float)) / principals
+
+    # The annuity factor grows with the rate, so bisect every listing at once
+    low = np.zeros_like(target)
+    high = np.full_like(target, MAX_BREAK_EVEN_RATE)
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        above = finance.annuity_factors(mid, years) > target
+        high = np.where(above, mid, high)
+        low = np.where(above, low, mid)
+
+    rates = (low + high) / 2
+    rates[target <= finance.annuity_factor(0.0, years)] = np.nan
+    rates[target >= finance.annuity_factor(MAX_BREAK_EVEN_RATE, years)] = MAX_BREAK_EVEN_RATE
+    return rates
+
+
+def rank_stability(cashflows, top_n):
+    """
+    Rank of every listing (1 = best cashflow) in every scenario of the grid.
+    Returns best, median and worst rank and the share of scenarios in the top_n.
+    """
+    flat = cashflows.reshape(len(cashflows), -1)
+    order = np.argsort(-flat, axis=0, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, len(flat) + 1)[:, None], axis=0)
+    return {
+        "best": ranks.min(axis=1),
+        "median": np.median(ranks, axis=1),
+        "worst": ranks.max(axis=1),
+        "top_share": (ranks <= top_n).mean(axis=1),
+    }
+
+
+# ===== Report =====
+def report(listings, prices, rents, costs, down_payment, years, cmhc=True, top_n=5, rows=REPORT_ROWS):
+    """
+    Sweep the default grid over listings and print, most stable first, each
+    listing's break-even rate and rank spread. Returns the per-listing rows.
+    """
+    if not len(listings):
+        print("📊 Sweep: no listings to evaluate")
+        return []
+    start = time.perf_counter()
+    cashflows = grid_cashflows(prices, rents, costs, cmhc=cmhc)
+    break_even = break_even_rates(prices, rents, costs, down_payment, years, cmhc=cmhc)
+    stability = rank_stability(cashflows, top_n)
+    elapsed = time.perf_counter() - start
+
+    scenarios = cashflows[0].size
+    print(f"📊 Sweep: {scenarios} scenarios ({len(RATES)} rates × {len(DOWN_PAYMENTS)} down payments × "
+          f"{len(AMORTIZATIONS)} amortizations × {len(RENT_LEVELS)} rent levels) "
+          f"over {len(listings)} listings in {elapsed:.3f}s")
+
+    results = [{
+        "listing": listing,
+        "break_even_rate": float(break_even[i]),
+        "positive_share": float((cashflows[i] >= 0).mean()),
+        "best_rank": int(stability["best"][i]),
+        "median_rank": float(stability["median"][i]),
+        "worst_rank": int(stability["worst"][i]),
+        "top_share": float(stability["top_share"][i]),
+    } for i, listing in enumerate(listings)]
+    results.sort(key=lambda row: (-row["top_share"], row["median_rank"]))
+
+    print(f"{'Listing':<40} {'Break-even':>10} {'Cash+':>6} {'Rank best/median/worst':>23} {'Top ' + str(top_n):>7}")
+    for row in results[:rows]:
+        rate = row["break_even_rate"]
+        rate_text = "never" if np.isnan(rate) else (f">{rate:.0%}" if rate >= MAX_BREAK_EVEN_RATE else f"{rate:.2%}")
+        ranks = f"{row['best_rank']}/{row['median_rank']:g}/{row['worst_rank']}"
+        print(f"{repr(row['listing']):<40} {rate_text:>10} {row['positive_share']:>6.0%} {ranks:>23} "
+              f"{row['top_share']:>7.0%}")
+    return results
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import fetcher
+import http_client
+
+# ===== CONFIG =====
+TILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tiles.json")
+TILE_THRESHOLD = 500      # split a box once it reports more results than this (API caps near 600)
+MAX_TILE_DEPTH = 4        # at most 4**4 = 256 leaf tiles per market
+BBOX_KEYS = ("LatitudeMin", "LatitudeMax", "LongitudeMin", "LongitudeMax")
+
+
+# ===== Bounding boxes =====
+def bbox(payload):
+    """(lat_min, lat_max, lon_min, lon_max) of a search payload."""
+    return tuple(float(payload[key]) for key in BBOX_KEYS)
+
+
+def with_bbox(payload, box):
+    lat_min, lat_max, lon_min, lon_max = box
+    return dict(
+        payload,
+        LatitudeMin=f"{lat_min:.5f}",
+        LatitudeMax=f"{lat_max:.5f}",
+        LongitudeMin=f"{lon_min:.5f}",
+        LongitudeMax=f"{lon_max:.5f}",
+    )
+
+
+def tile_payload(payload, box):
+    """Payload for one tile; the unsplit market box keeps its original payload."""
+    if tuple(box) == bbox(payload):
+        return payload
+    return with_bbox(payload, box)
+
+
+def split_box(box):
+    """Split a box into its four quadrants (SW, SE, NW, NE)."""
+    lat_min, lat_max, lon_min, lon_max = box
+    lat_mid = (lat_min + lat_max) / 2
+    lon_mid = (lon_min + lon_max) / 2
+    return [
+        (lat_min, lat_mid, lon_min, lon_mid),
+        (lat_min, lat_mid, lon_mid, lon_max),
+        (lat_mid, lat_max, lon_min, lon_mid),
+        (lat_mid, lat_max, lon_mid, lon_max),
+    ]
+
+
+def reported_total(body):
+    paging = body.get("Paging") or {}
+    return int(paging.get("TotalRecords") or len(body.get("Results") or []))
+
+
+# ===== Tile discovery =====
+def discover_tiles(url, name, payload, threshold=TILE_THRESHOLD, max_depth=MAX_TILE_DEPTH,
+                   max_workers=fetcher.MAX_CONCURRENT_REQUESTS,
+                   headers=http_client.REALTOR_HEADERS, cookies=http_client.REALTOR_COOKIES):
+    """
+    Probe the market box and split every tile reporting more than threshold results
+    into quadrants, one depth level at a time with the level's probes in parallel.
+    Returns (leaf boxes, complete). Probes are page-1 requests, so the leaf fetch
+    that follows is served from the response cache. A probe that failed leaves its
+    box unsplit and complete False: its size is unknown, not small.
+    """
+    leaves = []
+    complete = True
+    level = [bbox(payload)]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for depth in range(max_depth + 1):
+            if not level:
+                break
+            bodies = pool.map(
+                lambda box: fetcher.fetch_page(url, tile_payload(payload, box), 1, headers, cookies, name)[0],
+                level,
+            )
+            next_level = []
+            for box, body in zip(level, bodies):
+                if body is None:
+                    complete = False
+                    leaves.append(box)
+                elif reported_total(body) <= threshold:
+                    leaves.append(box)
+                elif depth < max_depth:
+                    next_level.extend(split_box(box))
+                else:
+                    print(f"⚠️ {name}: a depth-{max_depth} tile still reports {reported_total(body)} results "
+                          f"(> {threshold}), listings past the API limit will be missed")
+                    leaves.append(box)
+            level = next_level
+
+    if complete:
+        print(f"🧩 {name}: {len(leaves)} tiles")
+    else:
+        print(f"⚠️ {name}: {len(leaves)} tiles, some probes failed; not saved, rediscovering next run")
+    return leaves, complete
+
+
+# ===== Persisted tile trees =====
+def tile_key(name, payload):
+    """Tiles depend on the market box and every filter, so hash the whole payload."""
+    blob = json.dumps([name, sorted((k, v) for k, v in payload.items() if k != "CurrentPage")])
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def load_tiles(path=None):
+    try:
+        with open(path or TILE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_tiles(tiles, path=None):
+    path = path or TILE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(tiles, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def tiled_regions(url, regions, rediscover=False, **kwargs):
+    """
+    Expand {market: payload} into {"market/i": tile payload}, reusing the tile
+    split saved by an earlier run unless rediscover is set. A split with failed
+    probes is used for this run only and never saved.
+    """
+    saved = load_tiles()
+    expanded = {}
+    changed = False
+
+    for name, payload in regions.items():
+        key = tile_key(name, payload)
+        if rediscover or key not in saved:
+            tiles, complete = discover_tiles(url, name, payload, **kwargs)
+            if complete:
+                saved[key] = {"market": name, "tiles": tiles}
+                changed = True
+        else:
+            tiles = saved[key]["tiles"]
+        for i, box in enumerate(tiles):
+            expanded[f"{name}/{i}"] = tile_payload(payload, box)
+
+    if changed:
+        save_tiles(saved)
+    return expanded
+
+
+# ===== Tiled fetch =====
+def fetch_tiled(url, regions, max_workers=fetcher.MAX_CONCURRENT_REQUESTS, rediscover=False, **kwargs):
+    """
+    Like fetcher.fetch_regions, but dense markets are split into tiles first.
+    Listings repeated across tiles and markets are dropped while fetching.
+    """
+    tiles = tiled_regions(url, regions, rediscover=rediscover, max_workers=max_workers)
+    return fetcher.fetch_regions(url, tiles, max_workers=max_workers, **kwargs)